@@ -1,3 +1,3 @@
 #!/usr/bin/env bash
 set -euo pipefail
-HF_DIR=${HF_DIR:-artifacts/hf_export} TARGET=${TARGET:-android} python -m src.quant.build_mlc
\ No newline at end of file
+HF_DIR=${HF_DIR:-artifacts/hf_export} python -m src.quant.build_mlc --targets ${TARGET:-android}
\ No newline at end of file
@@ -1,3 +1,3 @@
 #!/usr/bin/env bash
 set -euo pipefail
-python -m src.quant.export_hf
\ No newline at end of file
+python -m src.quant.export_hf "$@"
\ No newline at end of file
@@ -1,6 +1,11 @@
 """Agent runtime and prompt management."""
 
+from .adapters import AdapterManager
+from .memory import MemoryStore, UserMemory
+from .registry import ModelRegistry
+from .workers import WorkerPool
 from .runtime import step
 from .prompts import build_prompt
 
-__all__ = ["step", "build_prompt"]
\ No newline at end of file
+__all__ = ["AdapterManager", "MemoryStore", "UserMemory", "ModelRegistry", "WorkerPool", "step",
+           "build_prompt"]
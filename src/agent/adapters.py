@@ -0,0 +1,181 @@
+"""Serve several LoRA adapters on one shared base model.
+
+The base weights are loaded once; each adapter adds only its low-rank
+matrices. Requests pick one adapter, a stack of adapters, or none (the plain
+base model) through :meth:`AdapterManager.activate`. The active set is
+model-wide state: requests for the same selection run concurrently, and a
+request for a different one waits until those finish, then switches. A
+checkpoint without adapters never waits.
+
+``merge`` folds an adapter into the base weights in place, removing the LoRA
+overhead while that adapter is the only one in use; activating any other set
+unmerges it first.
+"""
+
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("adapters")
+
+AdapterSelection = Union[None, str, Sequence[str]]
+
+
+class AdapterManager:
+    """Load, unload, activate and merge LoRA adapters on a shared base model.
+
+    Args:
+        base_model: Loaded causal LM shared by all adapters
+        adapters: Optional mapping of adapter name to adapter directory
+    """
+
+    def __init__(self, base_model, adapters: Optional[Dict[str, str]] = None):
+        self.base_model = base_model
+        self.model = None  # PeftModel once the first adapter is loaded
+        self.paths: Dict[str, str] = {}
+        self._merged: Optional[str] = None
+        self._active: Optional[Tuple[str, ...]] = None  # selection the model is set up for
+        self._users = 0  # requests running with the active selection
+        self._changed = threading.Condition(threading.RLock())
+        for name, path in (adapters or {}).items():
+            self.load(name, path)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.paths)
+
+    @property
+    def merged(self) -> Optional[str]:
+        return self._merged
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        """Hold the lock once no request is using the model."""
+        with self._changed:
+            self._changed.wait_for(lambda: self._users == 0)
+            yield
+
+    def load(self, name: str, path: str) -> None:
+        """Load (or hot-reload) adapter ``name`` from ``path``."""
+        from peft import PeftModel
+
+        with self._exclusive():
+            if name in self.paths:
+                self.unload(name)
+            logger.info("Loading adapter %s from %s", name, path)
+            if self.model is None:
+                self.model = PeftModel.from_pretrained(self.base_model, path, adapter_name=name)
+            else:
+                self.model.load_adapter(path, adapter_name=name)
+            self.model.eval()
+            self.paths[name] = path
+            self._active = None
+
+    def unload(self, name: str) -> None:
+        """Remove adapter ``name`` and free its weights."""
+        with self._exclusive():
+            if name not in self.paths:
+                raise KeyError(f"Unknown adapter: {name}")
+            if self._merged == name:
+                self.unmerge()
+            self.model.delete_adapter(name)
+            del self.paths[name]
+            self._active = None
+
+    def sync(self, adapters: Dict[str, str]) -> None:
+        """Make the loaded adapters match ``adapters`` (e.g. after a config reload)."""
+        for name in [n for n in self.paths if n not in adapters]:
+            self.unload(name)
+        for name, path in adapters.items():
+            if self.paths.get(name) != path:
+                self.load(name, path)
+
+    def merge(self, name: str) -> None:
+        """Fold adapter ``name`` into the base weights in place."""
+        with self._exclusive():
+            self._check([name])
+            if self._merged == name:
+                return
+            self.unmerge()
+            self.model.base_model.enable_adapter_layers()
+            self.model.base_model.set_adapter(name, inference_mode=True)
+            self.model.base_model.merge_adapter([name])
+            self._merged = name
+            self._active = (name,)
+            logger.info("Merged adapter %s into the base weights", name)
+
+    def unmerge(self) -> None:
+        """Restore the original base weights if an adapter is merged."""
+        with self._exclusive():
+            if self._merged is not None:
+                self.model.base_model.unmerge_adapter()
+                self._merged = None
+                self._active = None
+
+    def _check(self, names: List[str]) -> None:
+        unknown = [n for n in names if n not in self.paths]
+        if unknown:
+            raise ValueError(f"Unknown adapter(s) {unknown}; loaded: {self.names}")
+
+    def _switch(self, names: Tuple[str, ...]) -> None:
+        """Set the model up for ``names``; call with the lock held and no users."""
+        if names == self._active:
+            return
+        lora = self.model.base_model
+        if self._merged is not None and names != (self._merged,):
+            # set_adapter / disabling would unmerge behind our back; do it explicitly
+            self.unmerge()
+        if not names:
+            lora.disable_adapter_layers()
+        else:
+            lora.enable_adapter_layers()
+            if names != (self._merged,):
+                lora.set_adapter(list(names) if len(names) > 1 else names[0], inference_mode=True)
+        self._active = names
+
+    def activate(self, selection: AdapterSelection = None):
+        """Context manager yielding the model with ``selection`` active.
+
+        Args:
+            selection: Adapter name, list of names to stack, or None for the
+                plain base model
+
+        Yields:
+            The model to call ``generate`` on
+        """
+        if self.model is None:
+            if selection:
+                self._check([selection] if isinstance(selection, str) else list(selection))
+            return nullcontext(self.base_model)
+        return self._activate(tuple([selection] if isinstance(selection, str) else selection or ()))
+
+    @contextmanager
+    def _activate(self, names: Tuple[str, ...]) -> Iterator:
+        self._check(list(names))
+        with self._changed:
+            self._changed.wait_for(lambda: self._users == 0 or self._active == names)
+            self._switch(names)
+            self._users += 1
+        try:
+            yield self.model
+        finally:
+            with self._changed:
+                self._users -= 1
+                self._changed.notify_all()
+
+
+def merge_adapter_checkpoint(base_dir: str, adapter_dir: str, out_dir: str) -> None:
+    """Write a standalone checkpoint with ``adapter_dir`` merged into ``base_dir``.
+
+    Use this to feed a LoRA variant to the HF export / MLC build, which expect
+    full weights.
+    """
+    from peft import PeftModel
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    base = AutoModelForCausalLM.from_pretrained(base_dir)
+    merged = PeftModel.from_pretrained(base, adapter_dir).merge_and_unload()
+    merged.save_pretrained(out_dir)
+    AutoTokenizer.from_pretrained(base_dir, use_fast=True).save_pretrained(out_dir)
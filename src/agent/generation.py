@@ -0,0 +1,208 @@
+"""Deadline-driven generation settings for :func:`runtime.step`.
+
+:class:`GenerationController` turns the ``model`` config section into
+``generate`` keyword arguments per request:
+
+* ``max_new_tokens``, ``temperature`` and ``top_p`` come from config;
+* generation stops at any of ``stop_strings`` (e.g. the model starting the
+  next ``<|user|>`` turn);
+* ``max_time_s`` is a wall-clock budget that starts once the request's
+  model is resolved (:meth:`GenerationBudget.start`). Waiting for an
+  adapter switch is deducted from it; queueing (e.g. in the worker pool
+  dispatcher) and a cold checkpoint load are not;
+* when more than ``queue_soft_limit`` other requests are waiting,
+  ``max_new_tokens`` shrinks in proportion (never below ``min_new_tokens``)
+  so the queue drains instead of every reply running to the cap.
+
+A reply cut off by the time or token limit is trimmed back to its last
+complete sentence by :meth:`GenerationBudget.finish`.
+"""
+
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("generation")
+
+# End of a sentence: terminal punctuation, optional closing quote/bracket, then whitespace or end
+_SENTENCE_END_RE = re.compile(r"[.!?…][\"'”’)\]]*(?=\s|$)")
+
+
+def trim_to_sentence(text: str) -> str:
+    """Cut ``text`` after its last complete sentence (unchanged if there is none)."""
+    ends = list(_SENTENCE_END_RE.finditer(text))
+    return text[:ends[-1].end()] if ends else text
+
+
+class StopOnStrings(StoppingCriteria):
+    """Stop once any stop string appears in the newly generated text.
+
+    Only the last few tokens are decoded per step, so the cost does not grow
+    with the length of the reply.
+    """
+
+    def __init__(self, tokenizer, stop_strings: Sequence[str], prompt_length: int):
+        self.tokenizer = tokenizer
+        self.stop_strings = [s for s in stop_strings if s]
+        self.prompt_length = prompt_length
+        # Every token decodes to at least one character
+        self.window = max((len(s) for s in self.stop_strings), default=0) + 1
+
+    def __call__(self, input_ids: torch.LongTensor, scores, **kwargs) -> torch.BoolTensor:
+        done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+        if not self.stop_strings:
+            return done
+        start = max(self.prompt_length, input_ids.shape[1] - self.window)
+        tails = self.tokenizer.batch_decode(input_ids[:, start:], skip_special_tokens=False)
+        for row, tail in enumerate(tails):
+            done[row] = any(s in tail for s in self.stop_strings)
+        return done
+
+
+class GenerationBudget:
+    """Generation limits for one request; see :meth:`GenerationController.request`."""
+
+    def __init__(self, controller: "GenerationController", queue_depth: int):
+        self.controller = controller
+        self.queue_depth = queue_depth
+        self.started = time.monotonic()
+        self.max_new_tokens = controller.max_new_tokens_for(queue_depth)
+
+    def start(self) -> None:
+        """Start the clock; call once the request's model is resolved."""
+        self.started = time.monotonic()
+
+    def remaining_time(self) -> Optional[float]:
+        """Seconds left of the wall-clock budget (None when unlimited)."""
+        if self.controller.max_time_s is None:
+            return None
+        return self.controller.max_time_s - (time.monotonic() - self.started)
+
+    def generate_kwargs(self, tokenizer, prompt_length: int) -> Dict[str, Any]:
+        """Keyword arguments for ``model.generate``; call right before generating."""
+        c = self.controller
+        kwargs: Dict[str, Any] = {
+            "max_new_tokens": self.max_new_tokens,
+            "pad_token_id": tokenizer.eos_token_id,
+        }
+        if c.temperature > 0:
+            kwargs.update(do_sample=True, temperature=c.temperature, top_p=c.top_p)
+        else:
+            kwargs["do_sample"] = False
+        remaining = self.remaining_time()
+        if remaining is not None:
+            # Always allow a short reply, even if waiting for the model ate the whole budget
+            kwargs["max_time"] = max(remaining, c.min_time_s)
+        if c.stop_strings:
+            stop = StopOnStrings(tokenizer, c.stop_strings, prompt_length)
+            kwargs["stopping_criteria"] = StoppingCriteriaList([stop])
+        return kwargs
+
+    def finish(self, tokenizer, new_token_ids: Sequence[int]) -> str:
+        """Decode and clean up a reply.
+
+        Cuts the reply at the first stop string. Stop strings that are
+        special tokens (e.g. ``<|user|>``) are matched on token ids, since
+        decoding drops them. If generation ended on the time or token limit
+        instead of EOS or a stop string, trims back to the last complete
+        sentence.
+        """
+        ids = list(new_token_ids)
+        added = tokenizer.get_added_vocab()
+        stop_ids = {added[s] for s in self.controller.stop_strings if s in added}
+        cut = next((i for i, t in enumerate(ids) if t in stop_ids), None)
+        text = tokenizer.decode(ids[:cut], skip_special_tokens=True)
+        stops = [i for i in (text.find(s) for s in self.controller.stop_strings) if i >= 0]
+        if stops:
+            return text[:min(stops)].strip()
+        eos = tokenizer.eos_token_id
+        if cut is not None or (eos is not None and eos in ids):
+            return text.strip()
+        logger.debug("Reply cut off after %d tokens; trimming to a sentence boundary", len(ids))
+        return trim_to_sentence(text.strip())
+
+
+class GenerationController:
+    """Per-request generation settings under a latency budget.
+
+    Args:
+        max_new_tokens: Reply length cap with no queue
+        temperature: Sampling temperature; 0 for greedy decoding
+        top_p: Nucleus sampling threshold
+        stop_strings: Strings that end generation
+        max_time_s: Wall-clock budget per request, from when its model is
+            resolved (queueing excluded); None for none
+        min_time_s: Generation time granted even when the budget is spent
+        min_new_tokens: Floor for the load-adapted ``max_new_tokens``
+        queue_soft_limit: Waiting requests tolerated before shrinking replies
+    """
+
+    def __init__(self, max_new_tokens: int = 300, temperature: float = 0.7, top_p: float = 0.9,
+                 stop_strings: Sequence[str] = (), max_time_s: Optional[float] = None,
+                 min_time_s: float = 0.5, min_new_tokens: int = 48, queue_soft_limit: int = 1):
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.stop_strings: List[str] = list(stop_strings)
+        self.max_time_s = max_time_s
+        self.min_time_s = min_time_s
+        self.min_new_tokens = min(min_new_tokens, max_new_tokens)
+        self.queue_soft_limit = queue_soft_limit
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any]) -> "GenerationController":
+        """Build from the ``model`` config section."""
+        controller = cls()
+        controller.configure(cfg)
+        return controller
+
+    def configure(self, cfg: Dict[str, Any]) -> None:
+        """Apply settings from the ``model`` config section (e.g. after a reload)."""
+        for key in ("max_new_tokens", "temperature", "top_p", "max_time_s",
+                    "min_time_s", "min_new_tokens", "queue_soft_limit"):
+            if key in cfg:
+                setattr(self, key, cfg[key])
+        if "stop_strings" in cfg:
+            self.stop_strings = list(cfg["stop_strings"] or [])
+        self.min_new_tokens = min(self.min_new_tokens, self.max_new_tokens)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def max_new_tokens_for(self, queue_depth: int) -> int:
+        """Reply length cap when ``queue_depth`` other requests are waiting."""
+        if queue_depth <= self.queue_soft_limit:
+            return self.max_new_tokens
+        scaled = self.max_new_tokens * max(self.queue_soft_limit, 1) // queue_depth
+        return max(self.min_new_tokens, scaled)
+
+    @contextmanager
+    def request(self, queue_depth: Optional[int] = None) -> Iterator[GenerationBudget]:
+        """Track one request and yield its :class:`GenerationBudget`.
+
+        Args:
+            queue_depth: Requests waiting behind this one; defaults to the
+                other requests currently in flight in this process
+        """
+        with self._lock:
+            depth = self._in_flight if queue_depth is None else queue_depth
+            self._in_flight += 1
+        try:
+            budget = GenerationBudget(self, depth)
+            if budget.max_new_tokens < self.max_new_tokens:
+                logger.info("Queue depth %d: capping reply at %d tokens",
+                            depth, budget.max_new_tokens)
+            yield budget
+        finally:
+            with self._lock:
+                self._in_flight -= 1
@@ -0,0 +1,369 @@
+"""Bounded-cost long-term conversational memory.
+
+Each user's conversation is kept as
+
+* the most recent turns, verbatim;
+* short summaries of older turns, produced every ``summarize_every`` turns;
+* a local vector index over every past turn and summary.
+
+:meth:`UserMemory.context` returns the recent turns plus the top-k memories
+most relevant to the new message, trimmed to a fixed token budget, so the
+prompt (and prefill cost) stays the same size no matter how long the
+conversation runs. Everything is in-process NumPy; no external service.
+"""
+
+import fcntl
+import hashlib
+import json
+import re
+import threading
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..utils.config import MemoryConfig
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("memory")
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def approx_tokens(text: str) -> int:
+    """Cheap token estimate (~1.3 tokens per word) when no tokenizer is given."""
+    return int(len(text.split()) * 1.3) + 1
+
+
+class HashingEmbedder:
+    """Deterministic bag-of-words embedder using the hashing trick.
+
+    Unigrams and bigrams are hashed with CRC32 into ``dim`` signed buckets and
+    the vector is L2-normalised, so cosine similarity is a dot product.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD_RE.findall(text.lower())
+            for gram in words + [a + " " + b for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(gram.encode())
+                out[row, h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-12)
+
+
+class VectorIndex:
+    """Inner-product index: exact search when small, IVF once it grows.
+
+    Args:
+        dim: Vector dimensionality
+        ivf_threshold: Size at which a k-means coarse quantizer is trained
+        nprobe: Number of IVF lists scanned per query
+    """
+
+    def __init__(self, dim: int, ivf_threshold: int = 1024, nprobe: int = 4):
+        self.dim = dim
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._size = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._trained_at = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._vectors[:self._size]
+
+    def add(self, vectors: np.ndarray) -> List[int]:
+        """Append vectors and return their ids."""
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        needed = self._size + len(vectors)
+        if needed > len(self._vectors):
+            grown = np.zeros((max(needed, 2 * len(self._vectors), 64), self.dim), dtype=np.float32)
+            grown[:self._size] = self.vectors
+            self._vectors = grown
+        ids = list(range(self._size, needed))
+        self._vectors[self._size:needed] = vectors
+        self._size = needed
+
+        if self._centroids is not None:
+            for i, c in zip(ids, np.argmax(vectors @ self._centroids.T, axis=1)):
+                self._lists[c].append(i)
+        # (Re)train the coarse quantizer whenever the index has doubled
+        if self._size >= self.ivf_threshold and self._size >= 2 * self._trained_at:
+            self._train()
+        return ids
+
+    def _train(self, iterations: int = 10) -> None:
+        data = self.vectors
+        nlist = max(1, int(np.sqrt(len(data))))
+        rng = np.random.default_rng(0)
+        centroids = data[rng.choice(len(data), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = data[assign == c]
+                if len(members):
+                    mean = members.mean(axis=0)
+                    centroids[c] = mean / max(np.linalg.norm(mean), 1e-12)
+        assign = np.argmax(data @ centroids.T, axis=1)
+        self._centroids = centroids
+        self._lists = [np.flatnonzero(assign == c).tolist() for c in range(nlist)]
+        self._trained_at = len(data)
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Return up to ``k`` ``(id, score)`` pairs, best first."""
+        if not self._size or k <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(self.dim)
+        if self._centroids is None:
+            candidates = np.arange(self._size)
+        else:
+            probe = np.argsort(-(self._centroids @ query))[:self.nprobe]
+            candidates = np.fromiter((i for c in probe for i in self._lists[c]), dtype=np.int64)
+            if not len(candidates):
+                return []
+        scores = self._vectors[candidates] @ query
+        top = np.argsort(-scores)[:k]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+
+def extractive_summary(turns: List[str], max_words: int = 60) -> str:
+    """Default summarizer: the first sentence of each turn, capped at ``max_words``."""
+    firsts = [_SENTENCE_RE.split(t.strip(), maxsplit=1)[0] for t in turns if t.strip()]
+    words = " ".join(firsts).split()
+    summary = " ".join(words[:max_words])
+    return summary + (" …" if len(words) > max_words else "")
+
+
+def truncate_to_budget(text: str, budget: int, count_tokens: Callable[[str], int]) -> str:
+    """Longest word prefix of ``text`` (marked with " …") costing at most ``budget``.
+
+    Returns an empty string when not even one word fits.
+    """
+    words, end = text.split(), "\n" if text.endswith("\n") else ""
+    lo, hi = 0, len(words)
+    while lo < hi:  # largest n whose prefix fits
+        mid = (lo + hi + 1) // 2
+        if count_tokens(" ".join(words[:mid]) + " …" + end) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return " ".join(words[:lo]) + " …" + end if lo else ""
+
+
+@dataclass
+class _Entry:
+    kind: str  # "turn" or "summary"
+    text: str
+
+
+class UserMemory:
+    """One user's recent turns, summaries and vector index.
+
+    Args:
+        config: The ``memory`` config section
+        embedder: Maps a list of texts to L2-normalised vectors
+        summarizer: Maps a list of turns to a short summary
+    """
+
+    def __init__(self, config: Optional[MemoryConfig] = None,
+                 embedder: Optional[Callable[[List[str]], np.ndarray]] = None,
+                 summarizer: Optional[Callable[[List[str]], str]] = None):
+        self.config = config or MemoryConfig()
+        self.embedder = embedder or HashingEmbedder(self.config.embedding_dim)
+        self.summarizer = summarizer or (
+            lambda t: extractive_summary(t, self.config.summary_max_words))
+        self.recent: List[str] = []
+        self.entries: List[_Entry] = []
+        self.index = VectorIndex(self.config.embedding_dim, self.config.ivf_threshold,
+                                 self.config.nprobe)
+        self._lock = threading.Lock()
+
+    def _add_entries(self, kind: str, texts: List[str]) -> None:
+        self.index.add(self.embedder(texts))
+        self.entries.extend(_Entry(kind, t) for t in texts)
+
+    def add_turns(self, *turns: str) -> Optional[dict]:
+        """Record new turns, summarizing the oldest ones when enough accumulate.
+
+        Returns:
+            The change as a record for :meth:`apply`, or None if every turn was blank
+        """
+        turns = [t for t in turns if t and t.strip()]
+        if not turns:
+            return None
+        with self._lock:
+            record: dict = {"turns": turns}
+            pending = self.recent + turns
+            overflow = len(pending) - self.config.keep_recent_turns
+            if overflow >= self.config.summarize_every:
+                record["summarized"] = overflow
+                record["summary"] = self.summarizer(pending[:overflow])
+            self._apply(record)
+        return record
+
+    def apply(self, record: dict) -> None:
+        """Replay a record from :meth:`add_turns` (e.g. read back from disk)."""
+        with self._lock:
+            self._apply(record)
+
+    def _apply(self, record: dict) -> None:
+        self._add_entries("turn", record["turns"])
+        self.recent.extend(record["turns"])
+        if "summary" in record:
+            self.recent = self.recent[record["summarized"]:]
+            self._add_entries("summary", [record["summary"]])
+
+    def context(self, query: str, token_budget: Optional[int] = None,
+                count_tokens: Callable[[str], int] = approx_tokens) -> Tuple[List[str], List[str]]:
+        """Select prompt context for ``query`` within ``token_budget`` tokens.
+
+        Recent turns are taken newest first, then retrieved memories
+        (summaries and turns not already in the prompt) best first, until
+        the budget is spent. A recent turn too long for what is left of the
+        budget is cut short rather than dropped along with everything
+        before it.
+
+        Returns:
+            ``(recent_turns, memories)``, both in prompt order
+        """
+        budget = self.config.token_budget if token_budget is None else token_budget
+        with self._lock:
+            recent_pool = list(self.recent[-self.config.keep_recent_turns:])
+            k = self.config.top_k + len(recent_pool)
+            hits = self.index.search(self.embedder([query])[0], k)
+            entries = [self.entries[i] for i, _ in hits]
+
+        recent: List[str] = []
+        seen = set()
+        for turn in reversed(recent_pool):
+            text, cost = turn, count_tokens(turn)
+            if cost > budget:
+                # Older recent turns stay eligible for retrieval below
+                text = truncate_to_budget(turn, budget, count_tokens)
+                if not text:
+                    break
+                cost = count_tokens(text)
+            recent.insert(0, text)
+            seen.add(turn)
+            budget -= cost
+            if text is not turn:
+                break
+
+        memories: List[str] = []
+        for entry in entries:
+            if len(memories) >= self.config.top_k:
+                break
+            if entry.text in seen:
+                continue
+            text = f"[summary] {entry.text}" if entry.kind == "summary" else entry.text
+            cost = count_tokens(text)
+            if cost > budget:
+                continue
+            memories.append(text)
+            seen.add(entry.text)
+            budget -= cost
+        return recent, memories
+
+
+class MemoryStore:
+    """Per-user :class:`UserMemory` instances, optionally persisted to disk.
+
+    With a ``persist_dir``, each user has an append-only log of
+    :meth:`UserMemory.add_turns` records, so a turn costs one small write no
+    matter how long the history is. :meth:`get` replays records appended
+    since it last looked, including ones written by other processes (e.g.
+    other serving workers). Appends hold an ``fcntl`` lock on the log from
+    catch-up to write, so processes sharing a user never lose each other's
+    turns. Files are named by a hash of the user id.
+
+    Args:
+        config: The ``memory`` config section; ``persist_dir`` None keeps
+            memory in RAM only
+        summarizer: Optional replacement for :func:`extractive_summary`
+    """
+
+    def __init__(self, config: Optional[MemoryConfig] = None,
+                 summarizer: Optional[Callable[[List[str]], str]] = None):
+        self.config = config or MemoryConfig()
+        self.persist_dir = Path(self.config.persist_dir) if self.config.persist_dir else None
+        self.summarizer = summarizer
+        self._users: Dict[str, UserMemory] = {}
+        self._offsets: Dict[str, int] = {}
+        self._user_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, user_id: str) -> Path:
+        return self.persist_dir / (hashlib.sha256(user_id.encode("utf-8")).hexdigest() + ".jsonl")
+
+    def _user(self, user_id: str) -> Tuple[UserMemory, threading.Lock]:
+        with self._lock:
+            memory = self._users.get(user_id)
+            if memory is None:
+                memory = self._users[user_id] = UserMemory(self.config, summarizer=self.summarizer)
+                self._offsets[user_id] = 0
+                self._user_locks[user_id] = threading.Lock()
+            return memory, self._user_locks[user_id]
+
+    def _catch_up(self, user_id: str, memory: UserMemory, f) -> None:
+        """Replay complete records in ``f`` past this user's offset."""
+        f.seek(self._offsets[user_id])
+        applied = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # a writer is mid-append; pick it up next time
+            memory.apply(json.loads(line))
+            self._offsets[user_id] += len(line)
+            applied += 1
+        if applied:
+            logger.debug("Replayed %d memory records for %s", applied, user_id)
+
+    def get(self, user_id: str) -> UserMemory:
+        """Return (loading or creating) the memory for ``user_id``."""
+        memory, lock = self._user(user_id)
+        if self.persist_dir:
+            path = self._path(user_id)
+            with lock:
+                try:
+                    if path.stat().st_size == self._offsets[user_id]:
+                        return memory
+                    with open(path, "rb") as f:
+                        fcntl.flock(f, fcntl.LOCK_SH)
+                        self._catch_up(user_id, memory, f)
+                except FileNotFoundError:
+                    pass
+        return memory
+
+    def add_turns(self, user_id: str, *turns: str) -> None:
+        """Record turns for ``user_id`` and append them to its log."""
+        memory, lock = self._user(user_id)
+        if self.persist_dir is None:
+            memory.add_turns(*turns)
+            return
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        with lock, open(self._path(user_id), "a+b") as f:
+            # Exclusive across processes from catch-up to append, so concurrent
+            # workers serving this user never miss each other's records
+            fcntl.flock(f, fcntl.LOCK_EX)
+            # Apply whatever is already logged first, so the summary is cut at
+            # the same turns everywhere
+            self._catch_up(user_id, memory, f)
+            record = memory.add_turns(*turns)
+            if record is None:
+                return
+            line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+            f.write(line)
+            f.flush()
+            self._offsets[user_id] += len(line)
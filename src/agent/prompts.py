@@ -1,11 +1,25 @@
-from pathlib import Path
-SYSTEM = Path("prompts/system_therapist.md").read_text()
-
-def build_prompt(sensor_ctx: str, user_msg: str, history: list[str]):
-    h = "".join(history[-6:])
-    return (
-        f"<|system|>\n{SYSTEM}\n"
-        f"<|user|>\n{sensor_ctx}\n\nUser: {user_msg}\n"
-        f"<|history|>\n{h}\n"
-        f"<|assistant|>"
-    )
\ No newline at end of file
+from typing import Optional
+from ..data.prompt_template import format_memories, load_chat_template
+
+TEMPLATE = load_chat_template()
+SYSTEM = TEMPLATE.static["system"]
+
+def prompt_fields(sensor_ctx: str, user_msg: str, history: list[str],
+                  memories: Optional[list[str]] = None) -> dict:
+    # Same fields as a training row (see training/sft.py), minus the target
+    return {
+        "memory": format_memories(memories),
+        "context": sensor_ctx,
+        "dialogue": f"User: {user_msg}",
+        "history": "".join(history[-6:]),
+    }
+
+def build_prompt(sensor_ctx: str, user_msg: str, history: list[str],
+                 memories: Optional[list[str]] = None):
+    return TEMPLATE.render(prompt_fields(sensor_ctx, user_msg, history, memories))
+
+def encode_prompt(tokenizer, sensor_ctx: str, user_msg: str, history: list[str],
+                  memories: Optional[list[str]] = None) -> list[int]:
+    """Token ids of :func:`build_prompt`, tokenized exactly as in training."""
+    fields = prompt_fields(sensor_ctx, user_msg, history, memories)
+    return TEMPLATE.encode_batch([fields], tokenizer)["input_ids"][0]
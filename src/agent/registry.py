@@ -0,0 +1,276 @@
+"""Named model checkpoints with LRU residency and zero-downtime swaps.
+
+:class:`ModelRegistry` maps names (``"default"``, ``"candidate"``, …) to
+checkpoint directories and keeps the most recently used ones loaded within a
+memory budget. Requests take a :class:`ModelHandle` via :meth:`get` and keep
+using it until they finish, so eviction or a swap never disturbs a request
+already in flight; the old weights are freed once its last user lets go.
+
+:meth:`ModelRegistry.deploy` loads a new checkpoint for a name on a
+background thread, runs a warmup generation, and only then switches the
+name over, so a rollout costs no cold-start latency on the request path.
+Tokenizers whose files hash identically are loaded once and shared.
+"""
+
+import hashlib
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .adapters import AdapterManager
+from ..quant.shards import list_shards, mmap_state_dict, sha256_file
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("registry")
+
+# Files that define a tokenizer; checkpoints whose copies hash the same share one instance
+TOKENIZER_FILES = (
+    "tokenizer.json", "tokenizer_config.json", "special_tokens_map.json",
+    "vocab.json", "merges.txt", "tokenizer.model", "added_tokens.json",
+)
+
+
+def tokenizer_fingerprint(model_dir: str) -> str:
+    """Hash the tokenizer files of a checkpoint (the directory if there are none)."""
+    digest = hashlib.sha256()
+    found = False
+    for name in TOKENIZER_FILES:
+        path = Path(model_dir) / name
+        if path.is_file():
+            digest.update(f"{name}:{sha256_file(path)}\n".encode())
+            found = True
+    if not found:
+        digest.update(str(Path(model_dir).resolve()).encode())
+    return digest.hexdigest()
+
+
+def checkpoint_nbytes(model_dir: str) -> int:
+    """Estimate the resident size of a checkpoint from its weight files (0 if unknown)."""
+    try:
+        return sum(p.stat().st_size for p in list_shards(model_dir))
+    except FileNotFoundError:
+        return sum(p.stat().st_size for p in Path(model_dir).glob("*.bin"))
+
+
+def load_mmap_model(model_dir: str):
+    """Build a causal LM whose weights are the memory-mapped checkpoint shards.
+
+    Unlike ``from_pretrained``, nothing is copied into private memory, so
+    worker processes loading the same checkpoint share one physical copy of
+    the weights. Buffers the checkpoint does not store (e.g. rotary
+    frequencies) are computed as usual.
+    """
+    from accelerate import init_empty_weights
+    from transformers import AutoConfig, AutoModelForCausalLM
+
+    config = AutoConfig.from_pretrained(model_dir)
+    with init_empty_weights(include_buffers=False):
+        model = AutoModelForCausalLM.from_config(config)
+    model.load_state_dict(mmap_state_dict(model_dir), strict=False, assign=True)
+    model.tie_weights()
+    missing = [n for n, p in model.named_parameters() if p.is_meta]
+    if missing:
+        raise ValueError(f"Checkpoint {model_dir} is missing weights: {missing[:5]}")
+    return model.eval()
+
+
+def model_nbytes(model) -> int:
+    """Bytes held by a model's parameters and buffers."""
+    tensors = list(model.parameters()) + list(model.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+@dataclass
+class ModelHandle:
+    """A loaded checkpoint; hold on to it for the duration of a request."""
+    name: str
+    path: str
+    tokenizer: object
+    model: object
+    adapters: AdapterManager
+    nbytes: int
+    loaded_at: float = field(default_factory=time.time)
+
+
+class ModelRegistry:
+    """Hold several named checkpoints under a memory budget.
+
+    Args:
+        memory_budget_bytes: Total weight bytes to keep resident; None for no
+            limit. A swap briefly holds both the old and new weights.
+        adapters: Optional ``{checkpoint name: {adapter name: path}}`` loaded
+            onto each checkpoint as it comes into memory
+        warmup_prompt: Text generated from once before a loaded checkpoint
+            takes traffic; None skips warmup
+        max_loaders: Background load threads
+        mmap_weights: Serve weights straight from the memory-mapped shards
+            (see :func:`load_mmap_model`) instead of a private copy
+    """
+
+    def __init__(self, memory_budget_bytes: Optional[int] = None,
+                 adapters: Optional[Dict[str, Dict[str, str]]] = None,
+                 warmup_prompt: Optional[str] = "Hello", max_loaders: int = 1,
+                 mmap_weights: bool = False):
+        self.memory_budget_bytes = memory_budget_bytes
+        self.adapters = adapters or {}
+        self.warmup_prompt = warmup_prompt
+        self.mmap_weights = mmap_weights
+        self._paths: Dict[str, str] = {}
+        self._resident: "OrderedDict[str, ModelHandle]" = OrderedDict()
+        self._tokenizers: "weakref.WeakValueDictionary[str, object]" = weakref.WeakValueDictionary()
+        self._name_locks: Dict[str, threading.Lock] = {}
+        # Bumped whenever ``name`` is re-pointed, so slower cold loads of the old path are dropped
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self._loader = ThreadPoolExecutor(max_workers=max_loaders,
+                                          thread_name_prefix="model-loader")
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._paths)
+
+    @property
+    def paths(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._paths)
+
+    @property
+    def resident(self) -> List[str]:
+        """Loaded checkpoints, least recently used first."""
+        with self._lock:
+            return list(self._resident)
+
+    def register(self, name: str, path: str) -> None:
+        """Map ``name`` to ``path`` without loading it (takes effect on next load)."""
+        with self._lock:
+            self._paths[name] = path
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+    def set_adapters(self, name: str, adapters: Dict[str, str]) -> None:
+        """Replace the adapters of ``name``, syncing them now if it is loaded."""
+        with self._lock:
+            self.adapters[name] = dict(adapters)
+            handle = self._resident.get(name)
+        if handle is not None:
+            handle.adapters.sync(adapters)
+
+    def get(self, name: str) -> ModelHandle:
+        """Return the loaded checkpoint for ``name``, loading it on first use.
+
+        Raises:
+            KeyError: If ``name`` was never registered
+        """
+        with self._lock:
+            handle = self._resident.get(name)
+            if handle is not None:
+                self._resident.move_to_end(name)
+                return handle
+            if name not in self._paths:
+                raise KeyError(f"Unknown model: {name}; registered: {self.names}")
+            name_lock = self._name_locks.setdefault(name, threading.Lock())
+        # One cold load per name; concurrent callers wait for it
+        with name_lock:
+            with self._lock:
+                handle = self._resident.get(name)
+                path = self._paths[name]
+                version = self._versions.get(name, 0)
+            if handle is None:
+                logger.warning("Cold-loading model %s from %s on the request path", name, path)
+                handle = self._load(name, path)
+                with self._lock:
+                    if self._versions.get(name, 0) != version:
+                        # A deploy switched ``name`` while we loaded; serve this
+                        # request with what we have but don't publish the old path
+                        return self._resident.get(name) or handle
+                    self._publish(handle)
+            return handle
+
+    def deploy(self, name: str, path: str) -> "Future[ModelHandle]":
+        """Load ``path`` in the background and switch ``name`` to it when warm.
+
+        Requests keep using the current checkpoint for ``name`` (if any) until
+        the swap. The returned future resolves to the new handle, or carries
+        the load error, in which case ``name`` is left untouched.
+        """
+        def run() -> ModelHandle:
+            handle = self._load(name, path)
+            with self._lock:
+                self._paths[name] = path
+                self._versions[name] = self._versions.get(name, 0) + 1
+                self._publish(handle)
+            logger.info("Model %s now serving %s", name, path)
+            return handle
+
+        return self._loader.submit(run)
+
+    def evict(self, name: str) -> None:
+        """Drop ``name`` from memory; in-flight requests keep their handle."""
+        with self._lock:
+            if self._resident.pop(name, None) is not None:
+                logger.info("Evicted model %s", name)
+
+    def close(self) -> None:
+        """Stop background loading and release every checkpoint."""
+        self._loader.shutdown(wait=True)
+        with self._lock:
+            self._resident.clear()
+
+    def _resident_bytes(self) -> int:
+        return sum(h.nbytes for h in self._resident.values())
+
+    def _make_room(self, keep: str) -> None:
+        """Evict least recently used checkpoints (never ``keep``) until the budget is met."""
+        if self.memory_budget_bytes is None:
+            return
+        with self._lock:
+            for victim in [n for n in self._resident if n != keep]:
+                if self._resident_bytes() <= self.memory_budget_bytes:
+                    break
+                self.evict(victim)
+            if self._resident_bytes() > self.memory_budget_bytes:
+                logger.warning("Resident models use %d bytes, over the %d byte budget",
+                               self._resident_bytes(), self.memory_budget_bytes)
+
+    def _publish(self, handle: ModelHandle) -> None:
+        with self._lock:
+            self._resident[handle.name] = handle
+            self._resident.move_to_end(handle.name)
+            self._make_room(keep=handle.name)
+
+    def _tokenizer(self, path: str):
+        from transformers import AutoTokenizer
+
+        key = tokenizer_fingerprint(path)
+        with self._lock:
+            tok = self._tokenizers.get(key)
+        if tok is None:
+            tok = AutoTokenizer.from_pretrained(path, use_fast=True)
+            with self._lock:
+                tok = self._tokenizers.setdefault(key, tok)
+        return tok
+
+    def _load(self, name: str, path: str) -> ModelHandle:
+        import torch
+        from transformers import AutoModelForCausalLM
+
+        # Nothing is evicted until the load has succeeded (see _publish)
+        start = time.perf_counter()
+        tok = self._tokenizer(path)
+        if self.mmap_weights:
+            model = load_mmap_model(path)
+        else:
+            model = AutoModelForCausalLM.from_pretrained(path).eval()
+        adapters = AdapterManager(model, self.adapters.get(name))
+        if self.warmup_prompt:
+            with torch.no_grad():
+                ids = tok(self.warmup_prompt, return_tensors="pt")
+                model.generate(**ids, max_new_tokens=1, pad_token_id=tok.eos_token_id)
+        handle = ModelHandle(name, path, tok, model, adapters, model_nbytes(model))
+        logger.info("Loaded model %s from %s in %.2fs (%d bytes)",
+                    name, path, time.perf_counter() - start, handle.nbytes)
+        return handle
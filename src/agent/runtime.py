@@ -1,78 +1,164 @@
-import os
-import logging
-from typing import Optional
-from transformers import AutoModelForCausalLM, AutoTokenizer
-from .prompts import build_prompt
+from typing import List, Optional, Union
+import torch
+from .adapters import AdapterManager
+from .generation import GenerationController
+from .memory import MemoryStore
+from .prompts import encode_prompt
+from .registry import ModelHandle, ModelRegistry
 from ..data.sensor_encoder import SensorWindow, encode_for_prompt
+from ..utils.config import get_config, get_model_config, subscribe
 from ..utils.logging_setup import get_logger
 
 logger = get_logger("runtime")
 
-MODEL_DIR = os.getenv("SFT_CKPT", "artifacts/sft")
+DEFAULT_MODEL = "default"
 
-# Global model and tokenizer (lazy loaded)
-_tok: Optional[AutoTokenizer] = None
-_model: Optional[AutoModelForCausalLM] = None
+# Model registry (lazy created); "default" serves model.sft_checkpoint
+_registry: Optional[ModelRegistry] = None
+_memory: Optional[MemoryStore] = None
+_generation: Optional[GenerationController] = None
 
-def _load_model():
-    """Load model and tokenizer with proper error handling."""
-    global _tok, _model
-    
-    if _tok is not None and _model is not None:
-        return _tok, _model
-        
+def get_registry(mmap_weights: bool = False) -> ModelRegistry:
+    """Return the model registry, creating it from the ``model`` config on first use.
+
+    Args:
+        mmap_weights: Passed to :class:`ModelRegistry` when this call creates
+            it (worker processes set it at startup); ignored afterwards
+    """
+    global _registry
+    if _registry is None:
+        cfg = get_model_config()
+        budget = cfg.get("memory_budget_mb")
+        _registry = ModelRegistry(
+            memory_budget_bytes=budget * 2**20 if budget else None,
+            # LoRA adapters share the base weights of the default checkpoint
+            adapters={DEFAULT_MODEL: cfg.get("adapters") or {}},
+            warmup_prompt=cfg.get("warmup_prompt"),
+            mmap_weights=mmap_weights,
+        )
+        _registry.register(DEFAULT_MODEL, get_config().model.sft_checkpoint)
+        for name, path in (cfg.get("checkpoints") or {}).items():
+            _registry.register(name, path)
+        # Edits to model.adapters are applied without a restart
+        subscribe(lambda app: _registry.set_adapters(DEFAULT_MODEL, app.model.adapters))
+    return _registry
+
+def _load_model(name: Optional[str] = None) -> ModelHandle:
+    """Fetch a loaded checkpoint from the registry with proper error handling."""
+    name = name or DEFAULT_MODEL
     try:
-        logger.info(f"Loading model from {MODEL_DIR}")
-        _tok = AutoTokenizer.from_pretrained(MODEL_DIR, use_fast=True)
-        _model = AutoModelForCausalLM.from_pretrained(MODEL_DIR)
-        logger.info("Model loaded successfully") 
-        return _tok, _model
+        return get_registry().get(name)
+    except KeyError:
+        raise
     except Exception as e:
-        logger.error(f"Failed to load model from {MODEL_DIR}: {e}")
-        raise RuntimeError(f"Model loading failed: {e}. Please check that the model is trained and available at {MODEL_DIR}")
+        logger.error("Failed to load model %s: %s", name, e)
+        raise RuntimeError(f"Model loading failed: {e}. Please check that the model is trained "
+                           f"and available at {get_registry().paths.get(name)}")
+
+def deploy(path: str, name: str = DEFAULT_MODEL):
+    """Roll ``name`` over to the checkpoint at ``path`` without downtime.
 
-def step(sensor_window: SensorWindow, user_msg: str, history: list[str]) -> str:
+    Returns:
+        Future resolving once the new checkpoint is warm and serving
+    """
+    return get_registry().deploy(name, path)
+
+def get_adapter_manager(name: Optional[str] = None) -> AdapterManager:
+    """Return the adapter manager of a loaded checkpoint, loading it if needed."""
+    return _load_model(name).adapters
+
+def get_generation_controller() -> GenerationController:
+    """Return the generation controller, kept in sync with the ``model`` config."""
+    global _generation
+    if _generation is None:
+        _generation = GenerationController.from_config(get_model_config())
+        subscribe(lambda cfg: _generation.configure(cfg.model.model_dump()))
+    return _generation
+
+def get_memory_store() -> Optional[MemoryStore]:
+    """Return the per-user memory store, or None when ``memory.enabled`` is off."""
+    global _memory
+    cfg = get_config().memory
+    if not cfg.enabled:
+        return None
+    if _memory is None:
+        _memory = MemoryStore(cfg)
+    return _memory
+
+def step(sensor_window: SensorWindow, user_msg: str, history: list[str],
+         adapter: Union[None, str, List[str]] = None, user_id: Optional[str] = None,
+         model_name: Optional[str] = None, queue_depth: Optional[int] = None,
+         streamer=None) -> str:
     """Execute one step of the agent loop: perceive → decide → act.
     
     Args:
         sensor_window: Sensor data context window
         user_msg: User's message/query
         history: Previous conversation history
+        adapter: LoRA adapter name, or list of names to stack; defaults to
+            ``model.default_adapter`` (None serves the base model)
+        user_id: Enables long-term memory for this user: relevant older turns
+            and summaries are added to the prompt, and the recent turns are
+            supplied from memory when ``history`` is empty
+        model_name: Registered checkpoint to serve (``model.checkpoints``);
+            defaults to ``"default"``
+        queue_depth: Requests waiting behind this one, used to shorten
+            replies under load; defaults to the others in flight here
+        streamer: Optional ``transformers`` streamer fed the prompt and then
+            each new token as it is generated
         
     Returns:
         Agent's response
         
     Raises:
         RuntimeError: If model loading fails
+        KeyError: If ``model_name`` is not registered
         ValueError: If inputs are invalid
     """
     if not user_msg.strip():
         raise ValueError("User message cannot be empty")
         
     try:
-        tok, model = _load_model()
+        # Track the request from arrival so it counts towards the queue depth
+        with get_generation_controller().request(queue_depth) as budget:
+            # Hold the handle for the whole request so a concurrent swap or
+            # eviction cannot pull the weights out from under it
+            handle = _load_model(model_name)
+            tok = handle.tokenizer
+            # A cold load must not eat the reply's time budget
+            budget.start()
         
-        # Encode sensor context and build prompt
-        ctx = encode_for_prompt(sensor_window)
-        prompt = build_prompt(ctx, user_msg, history)
+            # Encode sensor context and build prompt
+            ctx = encode_for_prompt(sensor_window)
+            store = get_memory_store() if user_id is not None else None
+            memories = None
+            if store is not None:
+                recent, memories = store.get(user_id).context(
+                    user_msg, count_tokens=lambda s: len(tok(s).input_ids))
+                history = history or recent
+            # Same template and tokenization as the SFT data
+            prompt_ids = encode_prompt(tok, ctx, user_msg, history, memories)
         
-        logger.debug(f"Generated prompt length: {len(prompt)} chars")
+            logger.debug("Generated prompt length: %d tokens", len(prompt_ids))
         
-        # Generate response
-        ids = tok(prompt, return_tensors="pt")
-        out = model.generate(
-            **ids, 
-            max_new_tokens=300, 
-            temperature=0.7, 
-            do_sample=True, 
-            top_p=0.9,
-            pad_token_id=tok.eos_token_id
-        )
-        reply = tok.decode(out[0], skip_special_tokens=True).split("<|assistant|>")[-1].strip()
+            # Generate response
+            input_ids = torch.tensor([prompt_ids])
+            ids = {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+            prompt_length = input_ids.shape[1]
+            if adapter is None and (model_name or DEFAULT_MODEL) == DEFAULT_MODEL:
+                adapter = get_model_config().get("default_adapter")
+            with handle.adapters.activate(adapter) as active:
+                # Limits are computed once the model is ours, net of time spent waiting
+                kwargs = budget.generate_kwargs(tok, prompt_length)
+                out = active.generate(**ids, **kwargs, streamer=streamer)
+            new_ids = out[0, prompt_length:]
+            reply = budget.finish(tok, new_ids.tolist())
         
-        logger.info(f"Generated response length: {len(reply)} chars")
-        return reply
+            logger.info("Generated response length: %d chars", len(reply))
+            if store is not None:
+                store.add_turns(user_id, f"User: {user_msg}\n", f"Assistant: {reply}\n")
+            return reply
         
     except Exception as e:
-        logger.error(f"Step execution failed: {e}")
+        logger.error("Step execution failed: %s", e)
         raise
\ No newline at end of file
@@ -0,0 +1,338 @@
+"""Multi-process serving: a pool of core-pinned workers sharing one copy of the weights.
+
+A single process serves one ``generate`` at a time (the GIL plus intra-op
+threads contending for every core). :class:`WorkerPool` instead starts N
+worker processes, each pinned with ``sched_setaffinity`` to its own group of
+cores and running ``torch`` with that many threads. Each worker runs the
+normal :func:`runtime.step` with ``mmap_weights`` enabled, so all workers map
+the same checkpoint files and the kernel keeps a single physical copy of the
+weights in the page cache; per-worker memory is activations and KV cache.
+
+Requests are dispatched to whichever worker is idle. A worker that crashes or
+exceeds ``request_timeout`` is killed and restarted in the background, and
+idle workers are pinged every ``health_interval`` seconds.
+
+Example:
+    with WorkerPool.from_config() as pool:
+        reply = pool.step(window, "I slept badly again", history=[])
+"""
+
+import multiprocessing as mp
+import os
+import pickle
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from ..utils.config import get_config
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("workers")
+
+
+def core_groups(num_workers: Optional[int] = None, cores_per_worker: int = 4) -> List[List[int]]:
+    """Split the cores this process may run on into contiguous per-worker groups.
+
+    Args:
+        num_workers: Number of groups; None for one per ``cores_per_worker`` cores
+        cores_per_worker: Target group size when ``num_workers`` is None
+
+    Returns:
+        One list of core ids per worker
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    if num_workers is None:
+        num_workers = max(1, len(cores) // cores_per_worker)
+    num_workers = min(num_workers, len(cores))
+    size, extra = divmod(len(cores), num_workers)
+    groups, start = [], 0
+    for i in range(num_workers):
+        end = start + size + (i < extra)
+        groups.append(cores[start:end])
+        start = end
+    return groups
+
+
+def process_memory(pid: int) -> Dict[str, int]:
+    """Resident (RSS) and proportional (PSS) set size of ``pid`` in bytes, if available.
+
+    Shared weight pages are counted in full by every worker's RSS but split
+    between them in PSS, so the PSS sum is the pool's real footprint.
+    """
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    memory[key.lower()] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    return memory
+
+
+def _picklable(error: BaseException) -> BaseException:
+    try:
+        pickle.dumps(error)
+        return error
+    except Exception:
+        return RuntimeError(repr(error))
+
+
+def _worker_main(cores: List[int], conn, mmap_weights: bool) -> None:
+    """Worker process entry point: pin, load and warm up, then serve requests."""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    # Unpickling this function already imported torch (via the package
+    # __init__), too late for OMP_NUM_THREADS; size its intra-op pool directly
+    import torch
+
+    from . import runtime
+    from ..utils.logging_setup import setup_logging
+
+    torch.set_num_threads(len(cores))
+    setup_logging()
+    try:
+        # First registry use in this process, so the option takes effect
+        runtime.get_registry(mmap_weights=mmap_weights).get(runtime.DEFAULT_MODEL)
+    except Exception as e:
+        conn.send(("error", _picklable(e)))
+        return
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            kind, payload = conn.recv()
+        except EOFError:
+            return
+        if kind == "stop":
+            return
+        if kind == "ping":
+            conn.send(("pong", None))
+        elif kind == "step":
+            try:
+                conn.send(("ok", runtime.step(**payload)))
+            except Exception as e:
+                conn.send(("error", _picklable(e)))
+
+
+class _Worker:
+    """Parent-side handle of one worker process."""
+
+    def __init__(self, worker_id: int, cores: List[int], mmap_weights: bool):
+        self.worker_id = worker_id
+        self.cores = cores
+        self.mmap_weights = mmap_weights
+        self.process = None
+        self.conn = None
+        self.served = 0
+        self.restarts = -1
+
+    def start(self) -> None:
+        ctx = mp.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(self.cores, child_conn, self.mmap_weights),
+            name=f"agent-worker-{self.worker_id}", daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.restarts += 1
+
+    def wait_ready(self, timeout: float) -> None:
+        kind, payload = self.call(None, timeout)
+        if kind != "ready":
+            raise RuntimeError(f"Worker {self.worker_id} failed to start") from payload
+
+    def call(self, message, timeout: float):
+        """Send ``message`` (None to only receive) and wait for the reply.
+
+        Raises:
+            TimeoutError: If no reply arrives within ``timeout`` seconds
+            EOFError: If the worker process died
+        """
+        if message is not None:
+            self.conn.send(message)
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"Worker {self.worker_id} did not reply within {timeout}s")
+        return self.conn.recv()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self.process is None:
+            return
+        try:
+            self.conn.send(("stop", None))
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        alive = self.process is not None and self.process.is_alive()
+        return {
+            "worker_id": self.worker_id,
+            "pid": self.process.pid if self.process else None,
+            "cores": self.cores,
+            "alive": alive,
+            "served": self.served,
+            "restarts": self.restarts,
+            **(process_memory(self.process.pid) if alive else {}),
+        }
+
+
+class WorkerPool:
+    """Dispatch ``step`` calls across core-pinned worker processes.
+
+    Args:
+        num_workers: Worker processes; None for one per ``cores_per_worker`` cores
+        cores_per_worker: Target cores per worker
+        mmap_weights: Share memory-mapped weights between workers
+        request_timeout: Seconds before a busy worker is declared hung
+        health_interval: Seconds between pings of idle workers
+        startup_timeout: Seconds allowed for a worker to load and warm up
+    """
+
+    def __init__(self, num_workers: Optional[int] = None, cores_per_worker: int = 4,
+                 mmap_weights: bool = True, request_timeout: float = 120.0,
+                 health_interval: float = 10.0, startup_timeout: float = 600.0):
+        self.groups = core_groups(num_workers, cores_per_worker)
+        self.mmap_weights = mmap_weights
+        self.request_timeout = request_timeout
+        self.health_interval = health_interval
+        self.startup_timeout = startup_timeout
+        self._workers = [_Worker(i, cores, mmap_weights) for i, cores in enumerate(self.groups)]
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._waiting = 0
+        self._waiting_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=len(self._workers),
+                                            thread_name_prefix="dispatch")
+
+    @classmethod
+    def from_config(cls) -> "WorkerPool":
+        """Build a pool from the ``serving`` config section."""
+        cfg = get_config().serving
+        return cls(cfg.workers, cfg.cores_per_worker, cfg.mmap_weights,
+                   cfg.request_timeout, cfg.health_interval, cfg.startup_timeout)
+
+    def __len__(self) -> int:
+        return len(self._workers)
+
+    def start(self) -> "WorkerPool":
+        """Start every worker (loading in parallel) and wait until all are warm."""
+        for worker in self._workers:
+            worker.start()
+        for worker in self._workers:
+            worker.wait_ready(self.startup_timeout)
+            self._idle.put(worker)
+        logger.info("Started %d workers on core groups %s", len(self._workers), self.groups)
+        self._health_thread = threading.Thread(target=self._health_loop, name="worker-health",
+                                               daemon=True)
+        self._health_thread.start()
+        return self
+
+    def step(self, sensor_window, user_msg: str, history: List[str], **kwargs) -> str:
+        """Run :func:`runtime.step` on the next idle worker and return its reply.
+
+        Raises:
+            TimeoutError: If no worker becomes idle within ``request_timeout``
+            RuntimeError: If the worker crashed or hung (it is restarted)
+        """
+        if self._closed.is_set():
+            raise RuntimeError("Worker pool is closed")
+        with self._waiting_lock:
+            self._waiting += 1
+        try:
+            worker = self._idle.get(timeout=self.request_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No idle worker within {self.request_timeout}s")
+        finally:
+            with self._waiting_lock:
+                self._waiting -= 1
+
+        # Workers see only their own request; pass on the backlog so replies shorten under load
+        kwargs.setdefault("queue_depth", self._waiting)
+        payload = dict(sensor_window=sensor_window, user_msg=user_msg, history=history, **kwargs)
+        try:
+            kind, result = worker.call(("step", payload), self.request_timeout)
+        except (TimeoutError, EOFError, OSError) as e:
+            logger.error("Worker %d failed: %s; restarting it", worker.worker_id, e)
+            self._revive(worker)
+            raise RuntimeError(f"Worker {worker.worker_id} failed: {e}") from e
+        worker.served += 1
+        self._idle.put(worker)
+        if kind == "error":
+            raise result
+        return result
+
+    def submit(self, sensor_window, user_msg: str, history: List[str], **kwargs) -> "Future[str]":
+        """Asynchronous :meth:`step`."""
+        return self._executor.submit(self.step, sensor_window, user_msg, history, **kwargs)
+
+    def check_health(self) -> None:
+        """Ping every idle worker once, restarting dead or unresponsive ones."""
+        for _ in range(self._idle.qsize()):
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if not worker.process.is_alive():
+                    raise EOFError("process exited")
+                worker.call(("ping", None), timeout=min(self.request_timeout, 10.0))
+            except (TimeoutError, EOFError, OSError) as e:
+                logger.warning("Worker %d failed health check (%s); restarting it",
+                               worker.worker_id, e)
+                self._revive(worker)
+                continue
+            self._idle.put(worker)
+
+    def _health_loop(self) -> None:
+        while not self._closed.wait(self.health_interval):
+            self.check_health()
+
+    def _revive(self, worker: _Worker) -> None:
+        """Restart ``worker`` in the background and return it to the pool when warm."""
+        def run() -> None:
+            delay = 1.0
+            while not self._closed.is_set():
+                worker.stop(timeout=1.0)
+                try:
+                    worker.start()
+                    worker.wait_ready(self.startup_timeout)
+                except Exception:
+                    logger.exception("Restarting worker %d failed; retrying in %.0fs",
+                                     worker.worker_id, delay)
+                    self._closed.wait(delay)
+                    delay = min(delay * 2, 60.0)
+                    continue
+                logger.info("Worker %d restarted (pid %d)", worker.worker_id, worker.process.pid)
+                self._idle.put(worker)
+                return
+
+        threading.Thread(target=run, name=f"revive-worker-{worker.worker_id}", daemon=True).start()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-worker pid, cores, liveness, request count, restarts and memory."""
+        return [w.stats() for w in self._workers]
+
+    def close(self) -> None:
+        """Stop all workers."""
+        self._closed.set()
+        self._executor.shutdown(wait=True)
+        for worker in self._workers:
+            worker.stop()
+
+    def __enter__(self) -> "WorkerPool":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,5 +1,7 @@
 """Data processing and sensor encoding modules."""
 
-from .sensor_encoder import SensorWindow, encode_for_prompt
+from .prompt_template import PromptTemplate, load_chat_template
+from .sensor_encoder import SensorWindow, encode_batch, encode_for_prompt
 
-__all__ = ["SensorWindow", "encode_for_prompt"]
\ No newline at end of file
+__all__ = ["PromptTemplate", "load_chat_template", "SensorWindow", "encode_batch",
+           "encode_for_prompt"]
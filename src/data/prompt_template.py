@@ -0,0 +1,104 @@
+"""Compiled chat prompt template shared by training and serving.
+
+``CHAT_LAYOUT`` is the one definition of the ``<|system|>/<|memory|>/
+<|user|>/<|history|>/<|assistant|>`` layout. :class:`PromptTemplate`
+compiles it once, folding static values (the system prompt) into the
+literal segments, so rendering a row only fills in the dynamic fields.
+
+Token ids always come from tokenizing the whole rendered text, never from
+joining per-segment ids: SentencePiece-style tokenizers (e.g. InternLM2)
+prepend a word boundary to every separately tokenized piece. Training
+(``training/sft.py``) and serving (``agent/prompts.py``) both go through
+:meth:`PromptTemplate.encode_batch`, so the ids match exactly the text
+that ``format_example`` and the quantization checks evaluate.
+"""
+
+from functools import lru_cache
+from pathlib import Path
+from string import Formatter
+from typing import Dict, List, Mapping, Optional, Sequence
+
+SYSTEM_PROMPT_PATH = "prompts/system_therapist.md"
+
+# ``memory`` is either empty or a whole ``<|memory|>`` section (see format_memories).
+# Serving renders with an empty ``target``; training fills in the reference reply.
+CHAT_LAYOUT = (
+    "<|system|>\n{system}\n"
+    "{memory}"
+    "<|user|>\n{context}\n\n{dialogue}\n"
+    "<|history|>\n{history}\n"
+    "<|assistant|>\n{target}"
+)
+
+
+def format_memories(memories: Optional[Sequence[str]]) -> str:
+    """``<|memory|>`` section for retrieved memories; empty when there are none."""
+    if not memories:
+        return ""
+    return "<|memory|>\n" + "".join(f"- {m}\n" for m in memories)
+
+
+class PromptTemplate:
+    """A ``str.format``-style layout compiled into static and dynamic segments.
+
+    Args:
+        layout: Template with ``{name}`` fields (no format specs)
+        **static: Field values fixed for every render, e.g. the system prompt
+    """
+
+    def __init__(self, layout: str, **static: str):
+        self.layout = layout
+        self.static = dict(static)
+        literals, fields = [""], []
+        for literal, name, spec, conversion in Formatter().parse(layout):
+            literals[-1] += literal
+            if name is None:
+                continue
+            if spec or conversion:
+                raise ValueError(f"Unsupported format spec on field {name!r}")
+            if name in self.static:
+                literals[-1] += str(self.static[name])
+            else:
+                fields.append(name)
+                literals.append("")
+        self.literals: List[str] = literals
+        self.fields: List[str] = fields
+
+    def render(self, row: Mapping[str, str]) -> str:
+        """Text for one row; missing fields render empty."""
+        parts = [self.literals[0]]
+        for name, literal in zip(self.fields, self.literals[1:]):
+            parts.append(row.get(name) or "")
+            parts.append(literal)
+        return "".join(parts)
+
+    def render_batch(self, rows: Sequence[Mapping[str, str]]) -> List[str]:
+        return [self.render(row) for row in rows]
+
+    def encode_batch(self, rows: Sequence[Mapping[str, str]], tokenizer,
+                     max_length: Optional[int] = None,
+                     return_text: bool = False) -> Dict[str, list]:
+        """Token ids for a batch of rows, tokenized in one batched call.
+
+        Args:
+            rows: Field values per row; missing fields render empty
+            tokenizer: Hugging Face tokenizer
+            max_length: Truncate each row to this many tokens (from the right)
+            return_text: Also return the rendered texts under ``"text"``
+
+        Returns:
+            ``input_ids`` and ``attention_mask`` lists, as a tokenizer would
+        """
+        texts = self.render_batch(rows)
+        input_ids = [list(ids)[:max_length] for ids in tokenizer(texts)["input_ids"]]
+        out: Dict[str, list] = {"input_ids": input_ids,
+                                "attention_mask": [[1] * len(ids) for ids in input_ids]}
+        if return_text:
+            out["text"] = texts
+        return out
+
+
+@lru_cache(maxsize=None)
+def load_chat_template(system_path: str = SYSTEM_PROMPT_PATH) -> PromptTemplate:
+    """The shared chat template with the system prompt read from ``system_path``."""
+    return PromptTemplate(CHAT_LAYOUT, system=Path(system_path).read_text())
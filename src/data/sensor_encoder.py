@@ -1,6 +1,7 @@
+import numpy as np
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional, Sequence
 
 SLOT = 14  # days to summarize
 
@@ -44,14 +45,30 @@ TEMPLATE = (
     "ema_mood_avg: {ema}\n"
 )
 
+def _bucket_column(name: str, values: Sequence[float]) -> np.ndarray:
+    """Vectorized :func:`bucket` over one metric for a whole batch."""
+    lo, hi = RANGES[name]
+    v = np.asarray(values, dtype=np.float64)
+    return np.where(v < lo, "low", np.where(v > hi, "high", "mid"))
+
+def encode_batch(windows: Sequence[SensorWindow]) -> List[str]:
+    """Render many windows in one pass; same output as :func:`encode_for_prompt` per window."""
+    if not windows:
+        return []
+    b = {name: _bucket_column(name, [getattr(w, name) for w in windows]) for name in RANGES}
+    return [
+        TEMPLATE.format(
+            days=(w.end - w.start).days,
+            se_bucket=b["sleep_efficiency"][i], se=w.sleep_efficiency,
+            sd_bucket=b["avg_sleep_duration_h"][i], sd=w.avg_sleep_duration_h,
+            st_bucket=b["steps"][i], steps=w.steps,
+            sc_bucket=b["screen_time_min"][i], sc=w.screen_time_min,
+            ul_bucket=b["unlocks"][i], ul=w.unlocks,
+            loc=w.locations_visited,
+            ema=w.ema_mood_avg if w.ema_mood_avg is not None else "unknown",
+        )
+        for i, w in enumerate(windows)
+    ]
+
 def encode_for_prompt(w: SensorWindow) -> str:
-    return TEMPLATE.format(
-        days=(w.end - w.start).days,
-        se_bucket=bucket("sleep_efficiency", w.sleep_efficiency), se=w.sleep_efficiency,
-        sd_bucket=bucket("avg_sleep_duration_h", w.avg_sleep_duration_h), sd=w.avg_sleep_duration_h,
-        st_bucket=bucket("steps", w.steps), steps=w.steps,
-        sc_bucket=bucket("screen_time_min", w.screen_time_min), sc=w.screen_time_min,
-        ul_bucket=bucket("unlocks", w.unlocks), ul=w.unlocks,
-        loc=w.locations_visited,
-        ema=w.ema_mood_avg if w.ema_mood_avg is not None else "unknown",
-    )
\ No newline at end of file
+    return encode_batch([w])[0]
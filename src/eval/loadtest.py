@@ -0,0 +1,468 @@
+"""Synthetic workload generator and load-test harness for the agent loop.
+
+Builds a reproducible workload of chat sessions: each has a synthetic
+:class:`SensorWindow` (sampled around ``RANGES`` so low/mid/high buckets all
+occur, with ``ema_mood_avg`` and ``resting_hr`` sometimes missing) and a few
+user turns. Sessions arrive as a Poisson process and send their turns one
+after another, with optional think time, at most ``--concurrency`` requests
+in flight. The report covers throughput, latency and TTFT percentiles, and
+peak memory.
+
+Targets:
+
+* ``runtime`` — :func:`src.agent.runtime.step` in this process (TTFT via a
+  streamer);
+* ``pool`` — a :class:`src.agent.workers.WorkerPool` from the ``serving``
+  config (no TTFT);
+* ``http`` — POST each request as JSON to ``--url``; TTFT is the time to the
+  first response byte, meaningful when the server streams.
+
+``--tiny-model DIR`` builds (once) and serves a small random GPT-2 with a
+locally trained tokenizer, so capacity runs need no downloads.
+
+Example:
+    python -m src.eval.loadtest --tiny-model artifacts/tiny-model \\
+        --sessions 20 --concurrency 4 --arrival-rate 2 --report artifacts/loadtest.json
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+import urllib.request
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from ..data.sensor_encoder import RANGES, SLOT, SensorWindow
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("loadtest")
+
+# Physical bounds for sampled values
+_LIMITS = {
+    "sleep_efficiency": (0.3, 1.0),
+    "avg_sleep_duration_h": (2.0, 12.0),
+    "steps": (0, 30000),
+    "screen_time_min": (0, 900),
+    "unlocks": (0, 400),
+}
+
+OPENERS = [
+    "I've been anxious after work.",
+    "I can't fall asleep lately and I keep checking my phone.",
+    "Honestly I'm fine, just a bit tired.",
+    "My exams are next week and I feel overwhelmed.",
+    "I had an argument with my partner and can't stop thinking about it.",
+    "I haven't wanted to leave the house much.",
+    "Work has been so stressful that I skip meals.",
+    "I feel lonely since I moved to a new city.",
+]
+FOLLOW_UPS = [
+    "Why do you think that is?",
+    "What could I try tonight?",
+    "That makes sense. Anything else?",
+    "I tried breathing exercises but they didn't help much.",
+    "Can you give me a short grounding exercise?",
+    "I don't know, it's hard to explain.",
+    "Yesterday was a little better, actually.",
+    "How do I talk to my manager about it?",
+]
+
+
+@dataclass
+class Session:
+    """One synthetic conversation."""
+    user_id: str
+    window: SensorWindow
+    messages: List[str]
+
+
+def synth_window(rng: random.Random, now: datetime, missing_ema: float = 0.3,
+                 missing_hr: float = 0.2) -> SensorWindow:
+    """Sample a sensor window around the ``RANGES`` bands.
+
+    Each ranged feature is drawn from a normal centred on its band with a
+    standard deviation of half the band width, so roughly a third of values
+    fall in the low or high bucket.
+    """
+    values: Dict[str, Any] = {}
+    for name, (lo, hi) in RANGES.items():
+        v = rng.gauss((lo + hi) / 2, (hi - lo) / 2)
+        lo_lim, hi_lim = _LIMITS.get(name, (lo - (hi - lo), hi + (hi - lo)))
+        v = min(max(v, lo_lim), hi_lim)
+        values[name] = int(round(v)) if isinstance(lo, int) else round(v, 3)
+    end = now - timedelta(hours=rng.randrange(0, 24 * 30))
+    return SensorWindow(
+        start=end - timedelta(days=SLOT),
+        end=end,
+        vigorous_min=int(rng.expovariate(1 / 20)),
+        resting_hr=None if rng.random() < missing_hr else int(rng.gauss(66, 8)),
+        locations_visited=1 + int(rng.expovariate(1 / 4)),
+        ema_mood_avg=None if rng.random() < missing_ema else round(rng.uniform(-2, 2), 2),
+        **values,
+    )
+
+
+def synth_workload(sessions: int, turns: int, seed: int = 0, missing_ema: float = 0.3,
+                   missing_hr: float = 0.2) -> List[Session]:
+    """Generate ``sessions`` conversations of 1..``turns`` user turns each."""
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1)
+    workload = []
+    for i in range(sessions):
+        n = rng.randint(1, turns)
+        messages = [rng.choice(OPENERS)] + [rng.choice(FOLLOW_UPS) for _ in range(n - 1)]
+        window = synth_window(rng, now, missing_ema, missing_hr)
+        workload.append(Session(f"loadtest-{seed}-{i}", window, messages))
+    return workload
+
+
+def save_workload(workload: List[Session], path: str) -> None:
+    with open(path, "w") as f:
+        for s in workload:
+            f.write(json.dumps({"user_id": s.user_id, "window": s.window.model_dump(mode="json"),
+                                "messages": s.messages}) + "\n")
+
+
+def load_workload(path: str) -> List[Session]:
+    with open(path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [Session(r["user_id"], SensorWindow(**r["window"]), r["messages"]) for r in rows]
+
+
+def build_tiny_model(out_dir: str) -> str:
+    """Write a small random GPT-2 and a BPE tokenizer trained on the workload text."""
+    out = Path(out_dir)
+    if (out / "config.json").exists():
+        return str(out)
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+    from ..agent.prompts import SYSTEM
+
+    markers = "<|system|> <|user|> <|history|> <|assistant|> User: Assistant:"
+    corpus = [SYSTEM] + OPENERS + FOLLOW_UPS + [markers]
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer.train_from_iterator(corpus * 4, trainers.BpeTrainer(
+        vocab_size=1024, special_tokens=["<unk>", "<eos>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()))
+    tok = PreTrainedTokenizerFast(tokenizer_object=tokenizer, eos_token="<eos>", unk_token="<unk>")
+    config = GPT2Config(vocab_size=len(tok), n_embd=128, n_layer=2, n_head=4, n_positions=4096,
+                        bos_token_id=tok.eos_token_id, eos_token_id=tok.eos_token_id)
+    GPT2LMHeadModel(config).save_pretrained(out)
+    tok.save_pretrained(out)
+    logger.info("Built tiny model in %s", out)
+    return str(out)
+
+
+@dataclass
+class RequestResult:
+    session: int
+    turn: int
+    start: float
+    latency: float
+    ttft: Optional[float] = None
+    output_tokens: Optional[int] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class Report:
+    target: str
+    requests: int
+    errors: int
+    wall_seconds: float
+    requests_per_sec: float
+    output_tokens_per_sec: Optional[float]
+    latency: Dict[str, float]
+    ttft: Optional[Dict[str, float]]
+    peak_rss_bytes: int
+    settings: Dict[str, Any] = field(default_factory=dict)
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99),
+            "mean": float(np.mean(values)), "max": float(np.max(values))}
+
+
+class _MemorySampler:
+    """Track the peak combined memory of this process and a set of worker pids."""
+
+    def __init__(self, pids: Callable[[], List[int]], interval: float = 0.2):
+        self.pids = pids
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+
+    def _run(self) -> None:
+        from ..agent.workers import process_memory
+
+        while True:
+            total = process_memory(os.getpid()).get("rss", 0)
+            # PSS splits shared weight pages between workers instead of counting them N times
+            total += sum(process_memory(pid).get("pss", 0) for pid in self.pids())
+            self.peak = max(self.peak, total)
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self) -> "_MemorySampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class _TimingStreamer:
+    """``generate`` streamer recording time to first new token and token count."""
+
+    def __init__(self):
+        self.first_token: Optional[float] = None
+        self.tokens = 0
+        self._prompt_seen = False
+
+    def put(self, value) -> None:
+        if not self._prompt_seen:  # the first call carries the prompt
+            self._prompt_seen = True
+            return
+        if self.first_token is None:
+            self.first_token = time.perf_counter()
+        self.tokens += int(value.numel())
+
+    def end(self) -> None:
+        pass
+
+
+def _no_cleanup() -> None:
+    pass
+
+
+def _runtime_target(use_memory: bool):
+    from ..agent import runtime
+
+    if use_memory:
+        runtime._memory = None  # re-created from the current config (see MEMORY_DIR in main)
+
+    def send(session: Session, message: str, history: List[str]):
+        streamer = _TimingStreamer()
+        reply = runtime.step(session.window, message, history,
+                             user_id=session.user_id if use_memory else None, streamer=streamer)
+        return reply, streamer.first_token, streamer.tokens
+
+    def close() -> None:
+        if use_memory:
+            runtime._memory = None  # its scratch directory is about to go away
+    return send, lambda: [], close
+
+
+def _pool_target(use_memory: bool):
+    from ..agent.workers import WorkerPool
+
+    pool = WorkerPool.from_config().start()
+
+    def send(session: Session, message: str, history: List[str]):
+        reply = pool.step(session.window, message, history,
+                          user_id=session.user_id if use_memory else None)
+        return reply, None, None
+    return send, lambda: [s["pid"] for s in pool.stats() if s["alive"]], pool.close
+
+
+def _http_target(url: str, timeout: float, use_memory: bool):
+    def send(session: Session, message: str, history: List[str]):
+        body = json.dumps({
+            "sensor_window": session.window.model_dump(mode="json"),
+            "user_msg": message,
+            "history": history,
+            "user_id": session.user_id if use_memory else None,
+        }).encode()
+        request = urllib.request.Request(url, data=body,
+                                         headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            first = response.read(1)
+            first_byte = time.perf_counter()
+            raw = first + response.read()
+        text = raw.decode("utf-8", errors="replace")
+        try:
+            parsed = json.loads(text)
+            text = parsed.get("reply", text) if isinstance(parsed, dict) else text
+        except ValueError:
+            pass
+        return text, first_byte, None
+    return send, lambda: [], lambda: None
+
+
+def run_load_test(workload: List[Session], send, concurrency: int = 4, arrival_rate: float = 0.0,
+                  think_time: float = 0.0, seed: int = 0) -> List[RequestResult]:
+    """Replay ``workload`` through ``send(session, message, history)``.
+
+    Args:
+        workload: Sessions to replay
+        send: Returns ``(reply, first_token_time or None, output_tokens or None)``
+        concurrency: Maximum requests in flight
+        arrival_rate: Session arrivals per second (Poisson); 0 starts all at once
+        think_time: Mean pause (exponential) between a reply and the next turn
+        seed: Seed for arrival and think-time sampling
+
+    Returns:
+        One result per request, in completion order
+    """
+    rng = random.Random(seed)
+    gate = threading.Semaphore(concurrency)
+    results: List[RequestResult] = []
+    lock = threading.Lock()
+
+    def run_session(index: int, session: Session, pauses: List[float]) -> None:
+        history: List[str] = []
+        for turn, message in enumerate(session.messages):
+            if turn:
+                time.sleep(pauses[turn - 1])
+            with gate:
+                start = time.perf_counter()
+                result = RequestResult(index, turn, start, 0.0)
+                try:
+                    reply, first_token, tokens = send(session, message, history)
+                    result.ttft = first_token - start if first_token is not None else None
+                    result.output_tokens = tokens
+                except Exception as e:
+                    reply = ""
+                    result.error = f"{type(e).__name__}: {e}"
+                result.latency = time.perf_counter() - start
+            with lock:
+                results.append(result)
+            history += [f"User: {message}\n", f"Assistant: {reply}\n"]
+
+    threads = []
+    offset = 0.0
+    begin = time.perf_counter()
+    for index, session in enumerate(workload):
+        pauses = [rng.expovariate(1 / think_time) if think_time > 0 else 0.0
+                  for _ in session.messages[1:]]
+        if arrival_rate > 0:
+            offset += rng.expovariate(arrival_rate)
+            time.sleep(max(0.0, begin + offset - time.perf_counter()))
+        thread = threading.Thread(target=run_session, args=(index, session, pauses), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def summarize(results: List[RequestResult], wall_seconds: float, peak_rss: int, target: str,
+              settings: Dict[str, Any]) -> Report:
+    """Aggregate request results into a :class:`Report`."""
+    ok = [r for r in results if r.error is None]
+    ttfts = [r.ttft for r in ok if r.ttft is not None]
+    tokens = [r.output_tokens for r in ok if r.output_tokens is not None]
+    return Report(
+        target=target,
+        requests=len(results),
+        errors=len(results) - len(ok),
+        wall_seconds=wall_seconds,
+        requests_per_sec=len(ok) / wall_seconds if wall_seconds else 0.0,
+        output_tokens_per_sec=sum(tokens) / wall_seconds if tokens and wall_seconds else None,
+        latency=_percentiles([r.latency for r in ok]) if ok else {},
+        ttft=_percentiles(ttfts) if ttfts else None,
+        peak_rss_bytes=peak_rss,
+        settings=settings,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--target", choices=["runtime", "pool", "http"], default="runtime")
+    parser.add_argument("--url", help="endpoint for --target http")
+    parser.add_argument("--timeout", type=float, default=300.0, help="HTTP request timeout")
+    parser.add_argument("--tiny-model", metavar="DIR",
+                        help="build/serve a tiny offline model from DIR")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3, help="maximum user turns per session")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--arrival-rate", type=float, default=0.0,
+                        help="sessions per second; 0 = all at once")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between turns")
+    parser.add_argument("--missing-ema", type=float, default=0.3)
+    parser.add_argument("--missing-hr", type=float, default=0.2)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="don't send user ids (no long-term memory); runtime/pool "
+                             "runs otherwise keep memory in a temporary directory, http "
+                             "runs in the server's store")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workload",
+                        help="replay sessions from this JSONL instead of synthesizing")
+    parser.add_argument("--save-workload", help="write the synthesized sessions here")
+    parser.add_argument("--report", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    if args.target == "http" and not args.url:
+        parser.error("--target http requires --url")
+    if args.tiny_model:
+        # Must be set before the runtime creates its model registry
+        os.environ["SFT_CKPT"] = args.tiny_model
+        build_tiny_model(args.tiny_model)
+
+    if args.workload:
+        workload = load_workload(args.workload)
+    else:
+        workload = synth_workload(args.sessions, args.turns, args.seed,
+                                  args.missing_ema, args.missing_hr)
+    if args.save_workload:
+        save_workload(workload, args.save_workload)
+
+    use_memory = not args.no_memory
+    scratch, saved_env = None, os.environ.get("MEMORY_DIR")
+    if use_memory and args.target != "http":
+        # Synthetic users must never land in the configured memory store
+        scratch = tempfile.TemporaryDirectory(prefix="loadtest-memory-")
+        os.environ["MEMORY_DIR"] = scratch.name
+    close = _no_cleanup
+    try:
+        if args.target == "runtime":
+            send, pids, close = _runtime_target(use_memory)
+        elif args.target == "pool":
+            send, pids, close = _pool_target(use_memory)
+        else:
+            send, pids, close = _http_target(args.url, args.timeout, use_memory)
+
+        logger.info("Replaying %d sessions (%d requests) against %s", len(workload),
+                    sum(len(s.messages) for s in workload), args.target)
+        with _MemorySampler(pids) as sampler:
+            start = time.perf_counter()
+            results = run_load_test(workload, send, args.concurrency, args.arrival_rate,
+                                    args.think_time, args.seed)
+            wall = time.perf_counter() - start
+    finally:
+        close()
+        if scratch is not None:
+            if saved_env is None:
+                os.environ.pop("MEMORY_DIR", None)
+            else:
+                os.environ["MEMORY_DIR"] = saved_env
+            scratch.cleanup()
+    peak = max(sampler.peak, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+    settings = {k: v for k, v in vars(args).items() if k not in ("report", "save_workload")}
+    report = summarize(results, wall, peak, args.target, settings)
+
+    rendered = json.dumps(asdict(report), indent=2)
+    print(rendered)
+    if args.report:
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.report).write_text(rendered + "\n")
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,23 +1,181 @@
-import subprocess, os
-
-HF_DIR = os.getenv("HF_DIR", "artifacts/hf_export")
-MLC_OUT = os.getenv("MLC_OUT", "mobile/mlc-models")
-TARGET = os.getenv("TARGET", "android")  # or ios
-
-# Requires: pip install mlc-ai-nightly mlc-llm and Android NDK/Xcode toolchains
-
-preset = "q4f16_1"  # 4‑bit weights with FP16 scales per block
-subprocess.check_call([
-  "mlc_llm", "convert-weight",
-  "--model", HF_DIR,
-  "--quantization", preset,
-  "--output", os.path.join(MLC_OUT, "mindguard-7b-"+preset)
-])
-
-subprocess.check_call([
-  "mlc_llm", "build",
-  "--model", os.path.join(MLC_OUT, "mindguard-7b-"+preset),
-  "--artifact-path", MLC_OUT,
-  "--device", TARGET,
-])
-print("MLC build complete at", MLC_OUT)
\ No newline at end of file
+"""Incremental MLC-LLM build for the mobile targets.
+
+The pipeline is ``convert-weight`` once per (weights, preset), then one
+``build`` per target. Every step hashes its inputs and writes the hash to a
+stamp file in its output directory when it succeeds; a step whose stamp
+matches is skipped. Converted weights are shared by all targets and the
+target builds run concurrently::
+
+    python -m src.quant.build_mlc --targets android ios
+
+Requires: pip install mlc-ai-nightly mlc-llm and Android NDK/Xcode toolchains.
+Set ``MLC_LLM`` to use a different executable (e.g. a stub in tests).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .export_hf import MANIFEST_NAME
+from .shards import sha256_file
+from ..utils.config import get_config
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("build_mlc")
+
+MODEL_NAME = "mindguard-7b"
+STAMP_NAME = ".build-stamp"
+
+
+@dataclass
+class StepResult:
+    """Outcome of one pipeline step."""
+    step: str
+    seconds: float
+    skipped: bool
+
+
+def hash_inputs(hf_dir: str) -> str:
+    """Fingerprint an HF export directory.
+
+    Uses the per-shard checksums from ``export_manifest.json`` when the export
+    wrote one and the shard's size and mtime still match what it recorded, so
+    multi-GB weights are not re-read; a shard that differs (or has no entry)
+    is hashed by content. Other files are hashed by content when small and
+    by size and mtime otherwise.
+    """
+    root = Path(hf_dir)
+    digest = hashlib.sha256()
+    manifest = root / MANIFEST_NAME
+    shard_sums = json.loads(manifest.read_text())["shards"] if manifest.exists() else {}
+    for path in sorted(p for p in root.rglob("*") if p.is_file()):
+        rel = path.relative_to(root).as_posix()
+        digest.update(rel.encode())
+        stat = path.stat()
+        entry = shard_sums.get(rel, {})
+        if entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+            digest.update(entry["sha256"].encode())
+        elif path.suffix == ".safetensors" or stat.st_size <= 1 << 20:
+            if rel in shard_sums:
+                logger.warning("%s changed since it was exported; hashing its content", rel)
+            digest.update(sha256_file(path).encode())
+        else:
+            digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def _step_key(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+class MLCBuilder:
+    """Runs the convert/build steps, skipping those whose outputs are current.
+
+    Args:
+        hf_dir: HF export to convert
+        out_dir: Root for converted weights and per-target artifacts
+        preset: MLC quantization preset
+        mlc_llm: Executable to invoke
+        force: Ignore stamps and rerun every step
+    """
+
+    def __init__(self, hf_dir: str, out_dir: str, preset: str = "q4f16_1",
+                 mlc_llm: str = "mlc_llm", force: bool = False):
+        self.hf_dir = hf_dir
+        self.out_dir = Path(out_dir)
+        self.preset = preset
+        self.mlc_llm = mlc_llm
+        self.force = force
+
+    @property
+    def weights_dir(self) -> Path:
+        return self.out_dir / f"{MODEL_NAME}-{self.preset}"
+
+    def target_dir(self, target: str) -> Path:
+        return self.out_dir / target
+
+    def _run_step(self, name: str, key: str, out: Path, cmd: List[str]) -> StepResult:
+        stamp = out / STAMP_NAME
+        if not self.force and stamp.exists() and stamp.read_text().strip() == key:
+            logger.info("%s is up to date", name)
+            return StepResult(name, 0.0, True)
+
+        # Invalidate first so an interrupted step is never mistaken for a finished one
+        if stamp.exists():
+            stamp.unlink()
+        logger.info("Running %s: %s", name, " ".join(cmd))
+        start = time.perf_counter()
+        subprocess.check_call(cmd)
+        elapsed = time.perf_counter() - start
+        out.mkdir(parents=True, exist_ok=True)
+        stamp.write_text(key + "\n")
+        logger.info("%s finished in %.1fs", name, elapsed)
+        return StepResult(name, elapsed, False)
+
+    def convert(self, weights_hash: str) -> Tuple[StepResult, str]:
+        key = _step_key("convert-weight", weights_hash, self.preset)
+        result = self._run_step("convert-weight", key, self.weights_dir, [
+            self.mlc_llm, "convert-weight",
+            "--model", self.hf_dir,
+            "--quantization", self.preset,
+            "--output", str(self.weights_dir),
+        ])
+        return result, key
+
+    def build(self, target: str, convert_key: str) -> StepResult:
+        key = _step_key("build", convert_key, target)
+        return self._run_step(f"build[{target}]", key, self.target_dir(target), [
+            self.mlc_llm, "build",
+            "--model", str(self.weights_dir),
+            "--artifact-path", str(self.target_dir(target)),
+            "--device", target,
+        ])
+
+    def run(self, targets: List[str], jobs: Optional[int] = None) -> List[StepResult]:
+        """Convert once, then build every target concurrently."""
+        start = time.perf_counter()
+        hash_result = StepResult("hash-inputs", 0.0, False)
+        weights_hash = hash_inputs(self.hf_dir)
+        hash_result.seconds = time.perf_counter() - start
+
+        convert_result, convert_key = self.convert(weights_hash)
+        results = [hash_result, convert_result]
+        with ThreadPoolExecutor(max_workers=jobs or len(targets) or 1) as pool:
+            results.extend(pool.map(lambda t: self.build(t, convert_key), targets))
+        return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    config = get_config()
+    parser = argparse.ArgumentParser(description="Incremental MLC-LLM build for mobile targets.")
+    parser.add_argument("--hf-dir", default=config.model.hf_export_dir)
+    parser.add_argument("--out", default=config.quantization.mlc_output_dir)
+    parser.add_argument("--preset", default=config.quantization.preset)
+    parser.add_argument("--targets", nargs="+", default=config.quantization.targets)
+    parser.add_argument("--jobs", type=int, default=None, help="concurrent target builds")
+    parser.add_argument("--force", action="store_true", help="rerun every step")
+    args = parser.parse_args(argv)
+
+    builder = MLCBuilder(args.hf_dir, args.out, args.preset,
+                         mlc_llm=os.getenv("MLC_LLM", "mlc_llm"), force=args.force)
+    results = builder.run(args.targets, args.jobs)
+
+    for r in results:
+        print(f"{r.step:<24} {'skipped' if r.skipped else f'{r.seconds:8.1f}s'}")
+    report = {"preset": args.preset, "targets": args.targets, "steps": [asdict(r) for r in results]}
+    Path(args.out).mkdir(parents=True, exist_ok=True)
+    (Path(args.out) / "build_report.json").write_text(json.dumps(report, indent=2) + "\n")
+    print("MLC build complete at", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,264 @@
-from transformers import AutoModelForCausalLM, AutoTokenizer
+"""Export the SFT checkpoint to a sharded HF safetensors directory.
 
-CKPT = "artifacts/sft"
-OUT = "artifacts/hf_export"
+Tensors are streamed from the memory-mapped source shards into output shards
+of at most ``--max-shard-size`` bytes, optionally cast to another dtype on the
+way, so peak memory stays around one output shard instead of the full model.
+Each written shard's SHA-256 is recorded in ``export_manifest.json``; on the
+next run, shards whose inputs are unchanged and whose checksum still matches
+are skipped.
 
-tok = AutoTokenizer.from_pretrained(CKPT, use_fast=True)
-model = AutoModelForCausalLM.from_pretrained(CKPT)
-model.save_pretrained(OUT)
-tok.save_pretrained(OUT)
-print("Saved to", OUT)
\ No newline at end of file
+Checkpoints saved without safetensors fall back to a full
+``from_pretrained``/``save_pretrained`` round trip.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import torch
+from safetensors import safe_open
+from safetensors.torch import save_file
+
+from .shards import INDEX_NAME, SINGLE_NAME, list_shards, sha256_file
+from ..utils.config import get_config
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("export_hf")
+
+MANIFEST_NAME = "export_manifest.json"
+DTYPES = {"float32": torch.float32, "float16": torch.float16, "bfloat16": torch.bfloat16}
+_ST_DTYPES = {"F32": torch.float32, "F16": torch.float16, "BF16": torch.bfloat16,
+              "F64": torch.float64}
+_ST_SIZES = {"F64": 8, "I64": 8, "U64": 8, "F32": 4, "I32": 4, "U32": 4, "F16": 2, "BF16": 2,
+             "I16": 2, "U16": 2, "I8": 1, "U8": 1, "BOOL": 1, "F8_E4M3": 1, "F8_E5M2": 1}
+# Files that are weights or training state rather than part of the HF export
+_SKIP_SUFFIXES = {".safetensors", ".bin", ".pt", ".pth"}
+_SKIP_NAMES = {INDEX_NAME, "pytorch_model.bin.index.json", MANIFEST_NAME}
+
+
+@dataclass
+class _TensorPlan:
+    name: str
+    source: Path
+    shape: List[int]
+    src_dtype: str
+    nbytes: int
+
+
+@dataclass
+class _ShardPlan:
+    filename: str
+    tensors: List[_TensorPlan] = field(default_factory=list)
+    nbytes: int = 0
+
+    def key(self, source_fingerprints: Dict[Path, str], dtype: Optional[str]) -> str:
+        """Hash of everything that determines this shard's bytes."""
+        payload = [(t.name, source_fingerprints[t.source], t.shape, t.src_dtype)
+                   for t in self.tensors]
+        return hashlib.sha256(json.dumps([payload, dtype]).encode()).hexdigest()
+
+
+def parse_size(size: str) -> int:
+    """Parse ``"2GB"``/``"500MB"``/``"1024"`` into bytes."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*", size.upper())
+    if not match:
+        raise ValueError(f"Invalid size: {size!r}")
+    units = {"": 1, "B": 1, "K": 1e3, "KB": 1e3, "M": 1e6, "MB": 1e6, "G": 1e9, "GB": 1e9}
+    unit = units[match.group(2)]
+    return int(float(match.group(1)) * unit)
+
+
+def _fingerprint(path: Path) -> str:
+    stat = path.stat()
+    return f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _plan(sources: List[Path], dtype: Optional[str], max_shard_bytes: int) -> List[_ShardPlan]:
+    tensors = []
+    for source in sources:
+        with safe_open(str(source), framework="pt") as f:
+            for name in f.keys():
+                tslice = f.get_slice(name)
+                shape, src_dtype = list(tslice.get_shape()), tslice.get_dtype()
+                numel = 1
+                for dim in shape:
+                    numel *= dim
+                if src_dtype not in _ST_SIZES:
+                    raise ValueError(f"Tensor {name!r} in {source.name} has unsupported "
+                                     f"dtype {src_dtype}")
+                itemsize = _ST_SIZES[src_dtype]
+                if dtype and src_dtype in _ST_DTYPES:
+                    itemsize = DTYPES[dtype].itemsize
+                tensors.append(_TensorPlan(name, source, shape, src_dtype, numel * itemsize))
+
+    shards: List[_ShardPlan] = []
+    current = _ShardPlan("")
+    for tensor in tensors:
+        if current.tensors and current.nbytes + tensor.nbytes > max_shard_bytes:
+            shards.append(current)
+            current = _ShardPlan("")
+        current.tensors.append(tensor)
+        current.nbytes += tensor.nbytes
+    if current.tensors:
+        shards.append(current)
+
+    if len(shards) == 1:
+        shards[0].filename = SINGLE_NAME
+    else:
+        for i, shard in enumerate(shards, 1):
+            shard.filename = f"model-{i:05d}-of-{len(shards):05d}.safetensors"
+    return shards
+
+
+def _copy_side_files(src: Path, dst: Path, dtype: Optional[str]) -> None:
+    for path in src.iterdir():
+        if not path.is_file() or path.suffix in _SKIP_SUFFIXES or path.name in _SKIP_NAMES:
+            continue
+        if path.name == "training_args.bin" or path.name.startswith(
+                ("optimizer", "scheduler", "rng_state")):
+            continue
+        if path.name == "config.json" and dtype:
+            config = json.loads(path.read_text())
+            for key in ("torch_dtype", "dtype"):
+                if key in config:
+                    config[key] = dtype
+            (dst / path.name).write_text(json.dumps(config, indent=2) + "\n")
+        else:
+            shutil.copy2(path, dst / path.name)
+
+
+def _file_stat(path: Path) -> Dict[str, int]:
+    """Size and mtime recorded next to a shard's checksum, to tell if it changed later."""
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def stream_export(ckpt: str, out: str, dtype: Optional[str] = None,
+                  max_shard_size: str = "2GB") -> Dict[str, int]:
+    """Export ``ckpt`` to ``out`` one shard at a time.
+
+    Args:
+        ckpt: Source checkpoint directory with safetensors weights
+        out: Output directory
+        dtype: Optional target dtype for floating point tensors other than
+            fp8 (``float32``, ``float16`` or ``bfloat16``)
+        max_shard_size: Maximum bytes per output shard, e.g. ``"2GB"``
+
+    Returns:
+        Counts of ``written`` and ``skipped`` shards
+    """
+    if dtype is not None and dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype {dtype!r}; expected one of {sorted(DTYPES)}")
+    src, dst = Path(ckpt), Path(out)
+    sources = list_shards(ckpt)
+    fingerprints = {s: _fingerprint(s) for s in sources}
+    # Plan (and reject unsupported dtypes) before touching the output
+    shards = _plan(sources, dtype, parse_size(max_shard_size))
+    dst.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = dst / MANIFEST_NAME
+    previous = json.loads(manifest_path.read_text())["shards"] if manifest_path.exists() else {}
+    # Until the new manifest is written, the shards no longer match the old one
+    manifest_path.unlink(missing_ok=True)
+    manifest: Dict[str, Dict[str, Any]] = {}
+    stats = {"written": 0, "skipped": 0}
+
+    with ExitStack() as stack:
+        handles = {}
+        for shard in shards:
+            key = shard.key(fingerprints, dtype)
+            target = dst / shard.filename
+            prior = previous.get(shard.filename, {})
+            if (prior.get("key") == key and target.exists()
+                    and sha256_file(target) == prior.get("sha256")):
+                manifest[shard.filename] = {**prior, **_file_stat(target)}
+                stats["skipped"] += 1
+                logger.info("Skipping up-to-date shard %s", shard.filename)
+                continue
+
+            tensors = {}
+            for t in shard.tensors:
+                if t.source not in handles:
+                    handles[t.source] = stack.enter_context(
+                        safe_open(str(t.source), framework="pt"))
+                tensor = handles[t.source].get_tensor(t.name)
+                # Same rule as the plan: fp8 and integer tensors keep their dtype
+                if dtype and t.src_dtype in _ST_DTYPES:
+                    tensor = tensor.to(DTYPES[dtype])
+                tensors[t.name] = tensor.contiguous()
+
+            tmp = target.with_name(target.name + ".tmp")
+            save_file(tensors, str(tmp), metadata={"format": "pt"})
+            del tensors
+            os.replace(tmp, target)
+            manifest[shard.filename] = {"key": key, "sha256": sha256_file(target),
+                                        **_file_stat(target)}
+            stats["written"] += 1
+            logger.info("Wrote shard %s (%d tensors, %d bytes)",
+                        shard.filename, len(shard.tensors), shard.nbytes)
+
+    # Drop shards left over from an export with a different layout
+    planned = {s.filename for s in shards}
+    for stale in dst.glob("model*.safetensors"):
+        if stale.name not in planned:
+            stale.unlink()
+
+    if len(shards) > 1:
+        index = {
+            "metadata": {"total_size": sum(s.nbytes for s in shards)},
+            "weight_map": {t.name: s.filename for s in shards for t in s.tensors},
+        }
+        (dst / INDEX_NAME).write_text(json.dumps(index, indent=2) + "\n")
+    elif (dst / INDEX_NAME).exists():
+        (dst / INDEX_NAME).unlink()
+    manifest_path.write_text(json.dumps({"dtype": dtype, "shards": manifest}, indent=2) + "\n")
+
+    _copy_side_files(src, dst, dtype)
+    return stats
+
+
+def legacy_export(ckpt: str, out: str, dtype: Optional[str] = None,
+                  max_shard_size: str = "2GB") -> None:
+    """Full in-memory export for checkpoints without safetensors weights."""
+    # This path writes no manifest; a stale one would vouch for the old shards
+    (Path(out) / MANIFEST_NAME).unlink(missing_ok=True)
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tok = AutoTokenizer.from_pretrained(ckpt, use_fast=True)
+    model = AutoModelForCausalLM.from_pretrained(
+        ckpt, torch_dtype=DTYPES[dtype] if dtype else "auto", low_cpu_mem_usage=True)
+    model.save_pretrained(out, max_shard_size=max_shard_size)
+    tok.save_pretrained(out)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    model_cfg = get_config().model
+    parser = argparse.ArgumentParser(
+        description="Export the SFT checkpoint to sharded safetensors.")
+    parser.add_argument("--ckpt", default=model_cfg.sft_checkpoint)
+    parser.add_argument("--out", default=model_cfg.hf_export_dir)
+    parser.add_argument("--dtype", choices=sorted(DTYPES), default=None)
+    parser.add_argument("--max-shard-size", default="2GB")
+    args = parser.parse_args(argv)
+
+    try:
+        stats = stream_export(args.ckpt, args.out, args.dtype, args.max_shard_size)
+    except FileNotFoundError:
+        logger.warning("No safetensors weights in %s; falling back to a full in-memory export",
+                       args.ckpt)
+        legacy_export(args.ckpt, args.out, args.dtype, args.max_shard_size)
+        stats = {}
+    print("Saved to", args.out, stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""CPU emulation of MLC-LLM ``q4f16_1`` weight quantization.
+
+``q4f16_1`` stores every 2-D weight as symmetric 4-bit integers in groups of
+32 consecutive input features, with one fp16 scale per group
+(``w ≈ (q - 7) * scale``); all other parameters are kept in fp16. This module
+reproduces that rounding on an exported HF checkpoint, shard by shard, so the
+quality and size impact can be checked in CI before running the device
+toolchain::
+
+    python -m src.quant.q4f16_emulator --max-ppl-delta 0.5
+
+The emulated checkpoint holds the dequantized fp16 weights, so the reported
+CPU throughput is that of the emulated model under dense kernels, not of
+MLC's on-device 4-bit kernels.
+"""
+
+import argparse
+import json
+import math
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from safetensors import safe_open
+from safetensors.torch import save_file
+
+from .shards import list_shards
+from ..utils.config import get_config
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("q4f16_emulator")
+
+GROUP_SIZE = 32
+BITS = 4
+MAX_INT = (1 << (BITS - 1)) - 1  # 7; stored codes are q + 7 in [0, 14]
+
+
+def quantize_q4f16(weight: torch.Tensor,
+                   group_size: int = GROUP_SIZE) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Quantize a 2-D weight to packed 4-bit codes and per-group fp16 scales.
+
+    Args:
+        weight: ``[out_features, in_features]`` floating point tensor
+        group_size: Consecutive input features sharing one scale
+
+    Returns:
+        ``(packed, scale)`` where ``packed`` is uint8 ``[out, padded_in / 2]``
+        (two codes per byte, low nibble first) and ``scale`` is fp16
+        ``[out, padded_in / group_size]``
+    """
+    rows, cols = weight.shape
+    pad = (-cols) % group_size
+    w = weight.float()
+    if pad:
+        w = torch.nn.functional.pad(w, (0, pad))
+    groups = w.view(rows, -1, group_size)
+    scale = groups.abs().amax(dim=-1, keepdim=True) / MAX_INT
+    safe_scale = torch.where(scale == 0, torch.ones_like(scale), scale)
+    q = torch.clamp(torch.round(groups / safe_scale) + MAX_INT, 0, 2 * MAX_INT).to(torch.uint8)
+    q = q.view(rows, -1)
+    packed = q[:, 0::2] | (q[:, 1::2] << 4)
+    return packed, scale.view(rows, -1).to(torch.float16)
+
+
+def dequantize_q4f16(packed: torch.Tensor, scale: torch.Tensor, in_features: int,
+                     group_size: int = GROUP_SIZE) -> torch.Tensor:
+    """Invert :func:`quantize_q4f16`, returning an fp16 ``[out, in_features]`` tensor."""
+    rows = packed.shape[0]
+    q = torch.stack((packed & 0x0F, packed >> 4), dim=-1).view(rows, -1).float()
+    w = (q - MAX_INT).view(rows, -1, group_size) * scale.float().unsqueeze(-1)
+    return w.view(rows, -1)[:, :in_features].to(torch.float16)
+
+
+def is_quantized(name: str, tensor: torch.Tensor) -> bool:
+    """Whether ``q4f16_1`` quantizes this parameter (2-D float weights only)."""
+    return tensor.ndim == 2 and tensor.is_floating_point() and name.endswith("weight")
+
+
+def quantized_nbytes(shape: Tuple[int, int], group_size: int = GROUP_SIZE) -> int:
+    """On-device bytes for a quantized weight: packed codes plus fp16 scales."""
+    rows, cols = shape
+    padded = cols + (-cols) % group_size
+    return rows * padded // 2 + rows * (padded // group_size) * 2
+
+
+@dataclass
+class QuantReport:
+    """Size and error summary of an emulated quantization pass."""
+    quantized_tensors: int = 0
+    fp16_tensors: int = 0
+    original_bytes: int = 0
+    compressed_bytes: int = 0
+    max_rel_error: float = 0.0
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.original_bytes / self.compressed_bytes if self.compressed_bytes else 0.0
+
+    def merge(self, other: "QuantReport") -> None:
+        self.quantized_tensors += other.quantized_tensors
+        self.fp16_tensors += other.fp16_tensors
+        self.original_bytes += other.original_bytes
+        self.compressed_bytes += other.compressed_bytes
+        self.max_rel_error = max(self.max_rel_error, other.max_rel_error)
+
+
+def _quantize_shard(src: Path, dst: Path, group_size: int) -> QuantReport:
+    report = QuantReport()
+    out: Dict[str, torch.Tensor] = {}
+    with safe_open(str(src), framework="pt") as f:
+        metadata = f.metadata()
+        for name in f.keys():
+            tensor = f.get_tensor(name)
+            report.original_bytes += tensor.numel() * tensor.element_size()
+            if is_quantized(name, tensor):
+                packed, scale = quantize_q4f16(tensor, group_size)
+                deq = dequantize_q4f16(packed, scale, tensor.shape[1], group_size)
+                ref = tensor.float()
+                err = (deq.float() - ref).norm() / ref.norm().clamp_min(1e-12)
+                report.max_rel_error = max(report.max_rel_error, err.item())
+                report.compressed_bytes += quantized_nbytes(tuple(tensor.shape), group_size)
+                report.quantized_tensors += 1
+                out[name] = deq
+            else:
+                kept = tensor.to(torch.float16) if tensor.is_floating_point() else tensor
+                report.compressed_bytes += kept.numel() * kept.element_size()
+                report.fp16_tensors += 1
+                out[name] = kept
+            del tensor
+    save_file(out, str(dst), metadata=metadata or {"format": "pt"})
+    logger.info("Quantized %s (%d tensors)", src.name, len(out))
+    return report
+
+
+def quantize_checkpoint(hf_dir: str, out_dir: str, group_size: int = GROUP_SIZE,
+                        workers: int = 2) -> QuantReport:
+    """Write a q4f16_1-emulated copy of ``hf_dir`` to ``out_dir``.
+
+    Shards are processed independently on ``workers`` threads, so peak memory
+    is roughly ``workers`` shards rather than the whole model. Non-weight
+    files (config, tokenizer, shard index) are copied unchanged.
+
+    Args:
+        hf_dir: HF checkpoint directory with safetensors weights
+        out_dir: Destination for the dequantized fp16 checkpoint
+        group_size: Quantization group size (32 for ``q4f16_1``)
+        workers: Number of shards processed concurrently
+
+    Returns:
+        Aggregated :class:`QuantReport`
+    """
+    src, dst = Path(hf_dir), Path(out_dir)
+    dst.mkdir(parents=True, exist_ok=True)
+    for path in src.iterdir():
+        if path.is_file() and path.suffix != ".safetensors":
+            shutil.copy2(path, dst / path.name)
+
+    report = QuantReport()
+    shards = list_shards(hf_dir)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for part in pool.map(lambda s: _quantize_shard(s, dst / s.name, group_size), shards):
+            report.merge(part)
+    return report
+
+
+def _load_texts(val_path: str, limit: Optional[int]) -> List[str]:
+    from ..training.sft import format_example
+
+    texts = []
+    with open(val_path) as f:
+        for line in f:
+            if line.strip():
+                texts.append(format_example(json.loads(line)))
+    return texts[:limit] if limit else texts
+
+
+def _load_model(model_dir: str):
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    tok = AutoTokenizer.from_pretrained(model_dir, use_fast=True)
+    model = AutoModelForCausalLM.from_pretrained(model_dir, torch_dtype=torch.float32)
+    model.eval()
+    return tok, model
+
+
+@torch.no_grad()
+def perplexity(tok, model, texts: List[str], max_length: int = 2048) -> float:
+    """Token-weighted perplexity of ``model`` over ``texts``."""
+    total_nll, total_tokens = 0.0, 0
+    for text in texts:
+        ids = tok(text, return_tensors="pt", truncation=True, max_length=max_length)["input_ids"]
+        if ids.shape[1] < 2:
+            continue
+        loss = model(input_ids=ids, labels=ids).loss
+        n = ids.shape[1] - 1
+        total_nll += loss.item() * n
+        total_tokens += n
+    return math.exp(total_nll / total_tokens) if total_tokens else float("nan")
+
+
+@torch.no_grad()
+def throughput(tok, model, prompt: str, new_tokens: int = 32) -> float:
+    """Greedy-decoding tokens per second on the current device."""
+    ids = tok(prompt, return_tensors="pt")
+    pad_id = tok.pad_token_id if tok.pad_token_id is not None else tok.eos_token_id
+    start = time.perf_counter()
+    model.generate(**ids, max_new_tokens=new_tokens, min_new_tokens=new_tokens,
+                   do_sample=False, pad_token_id=pad_id)
+    return new_tokens / (time.perf_counter() - start)
+
+
+def evaluate(model_dir: str, texts: List[str], new_tokens: int = 32) -> Dict[str, float]:
+    """Perplexity and CPU decode throughput for one checkpoint."""
+    if not texts:
+        raise ValueError("No evaluation texts")
+    tok, model = _load_model(model_dir)
+    try:
+        return {
+            "perplexity": perplexity(tok, model, texts),
+            "tokens_per_sec": throughput(tok, model, texts[0], new_tokens),
+        }
+    finally:
+        del model
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    config = get_config()
+    quant_cfg = config.quantization.model_dump()
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--hf-dir", default=config.model.hf_export_dir)
+    parser.add_argument("--out", default="artifacts/q4f16_emulated")
+    parser.add_argument("--val", default=config.data.sft_val)
+    parser.add_argument("--group-size", type=int, default=quant_cfg.get("group_size", GROUP_SIZE))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--limit", type=int, default=None, help="evaluate on the first N rows only")
+    parser.add_argument("--new-tokens", type=int, default=32)
+    parser.add_argument("--max-ppl-delta", type=float, default=quant_cfg.get("max_ppl_delta"))
+    parser.add_argument("--report", default=None, help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    if config.quantization.preset != "q4f16_1":
+        logger.warning("Emulating q4f16_1 although the configured preset is %s",
+                       config.quantization.preset)
+
+    texts = _load_texts(args.val, args.limit)
+    if not texts:
+        parser.error(f"no validation rows in {args.val}; perplexity needs at least one")
+    quant = quantize_checkpoint(args.hf_dir, args.out, args.group_size, args.workers)
+    baseline = evaluate(args.hf_dir, texts, args.new_tokens)
+    emulated = evaluate(args.out, texts, args.new_tokens)
+
+    report = {
+        "preset": "q4f16_1",
+        "group_size": args.group_size,
+        "quantization": {**asdict(quant), "compression_ratio": quant.compression_ratio},
+        "baseline": baseline,
+        "emulated": emulated,
+        "ppl_delta": emulated["perplexity"] - baseline["perplexity"],
+    }
+    rendered = json.dumps(report, indent=2)
+    print(rendered)
+    if args.report:
+        Path(args.report).write_text(rendered)
+
+    delta = report["ppl_delta"]
+    if args.max_ppl_delta is not None and (not math.isfinite(delta) or delta > args.max_ppl_delta):
+        # NaN compares False with everything, so a diverged model must be caught explicitly
+        logger.error("Perplexity delta %.4f exceeds the allowed %.4f", delta, args.max_ppl_delta)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Helpers for walking sharded safetensors checkpoints one file at a time."""
+
+import hashlib
+import json
+import struct
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import torch
+
+INDEX_NAME = "model.safetensors.index.json"
+SINGLE_NAME = "model.safetensors"
+
+# safetensors dtype -> numpy dtype with the same width (BF16 is reinterpreted in torch)
+_NP_DTYPES = {
+    "F64": np.float64, "F32": np.float32, "F16": np.float16, "BF16": np.uint16,
+    "I64": np.int64, "I32": np.int32, "I16": np.int16, "I8": np.int8, "U8": np.uint8,
+    "BOOL": np.bool_,
+}
+
+
+def list_shards(model_dir: str) -> List[Path]:
+    """Return the safetensors shards of a HF checkpoint in index order.
+
+    Args:
+        model_dir: Directory produced by ``save_pretrained``
+
+    Returns:
+        Shard paths, each listed once
+
+    Raises:
+        FileNotFoundError: If the directory holds no safetensors weights
+    """
+    root = Path(model_dir)
+    index = root / INDEX_NAME
+    if index.exists():
+        weight_map: Dict[str, str] = json.loads(index.read_text())["weight_map"]
+        return [root / name for name in dict.fromkeys(weight_map.values())]
+    shards = sorted(root.glob("*.safetensors"))
+    if not shards:
+        raise FileNotFoundError(f"No safetensors weights found in {model_dir}")
+    return shards
+
+
+def sha256_file(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Stream a file through SHA-256 without reading it into memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def mmap_state_dict(model_dir: str) -> Dict[str, "torch.Tensor"]:
+    """Map every tensor of a safetensors checkpoint straight from disk.
+
+    The shards are memory-mapped copy-on-write, so the tensors share the page
+    cache: any number of processes mapping the same checkpoint hold a single
+    physical copy of the weights, faulted in on first touch.
+
+    Args:
+        model_dir: Directory produced by ``save_pretrained``
+
+    Returns:
+        Mapping of tensor name to a CPU tensor backed by the shard file
+    """
+    import torch
+
+    state_dict = {}
+    for shard in list_shards(model_dir):
+        with open(shard, "rb") as f:
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len))
+        header.pop("__metadata__", None)
+        data = np.memmap(shard, dtype=np.uint8, mode="c", offset=8 + header_len)
+        for name, meta in header.items():
+            start, end = meta["data_offsets"]
+            array = data[start:end].view(_NP_DTYPES[meta["dtype"]]).reshape(meta["shape"])
+            tensor = torch.from_numpy(array)
+            if meta["dtype"] == "BF16":
+                tensor = tensor.view(torch.bfloat16)
+            state_dict[name] = tensor
+    return state_dict
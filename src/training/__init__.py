@@ -1,5 +1,9 @@
 """Training modules for domain PT and SFT."""
 
+from .checkpointing import AsyncCheckpointTrainer, find_latest_checkpoint
 from .eval_metrics import classification_report
+from .telemetry import ThroughputCallback
+from .training_args import build_training_arguments
 
-__all__ = ["classification_report"]
\ No newline at end of file
+__all__ = ["AsyncCheckpointTrainer", "find_latest_checkpoint", "classification_report",
+           "ThroughputCallback", "build_training_arguments"]
@@ -0,0 +1,302 @@
+"""Asynchronous, atomic and resumable checkpointing for HF ``Trainer`` runs.
+
+``AsyncCheckpointTrainer`` replaces the blocking ``_save_checkpoint`` with a
+two-phase save:
+
+1. On the training thread, snapshot the model, optimizer, scheduler, scaler,
+   RNG and trainer state into CPU memory.
+2. On a background thread, serialize the snapshot into
+   ``.tmp-checkpoint-N``, write ``checkpoint_manifest.json`` with the size and
+   SHA-256 of every file, then ``os.replace`` it to ``checkpoint-N`` and
+   rotate old checkpoints.
+
+A half-written checkpoint therefore never carries the final name, and
+:func:`find_latest_checkpoint` skips checkpoints whose manifest does not
+match. The files use the stock ``Trainer`` layout, so
+``trainer.train(resume_from_checkpoint=...)`` restores weights, optimizer,
+scheduler, RNG and the dataloader position (the trainer skips the batches
+already consumed in the current epoch).
+
+For LoRA runs only the trainable adapter weights are snapshotted.
+
+Only one snapshot is in flight at a time: a save waits for the previous write
+to finish, bounding extra host memory to one copy of the training state.
+Distributed, DeepSpeed, FSDP and ``load_best_model_at_end`` runs fall back to
+the stock synchronous save.
+"""
+
+import copy
+import json
+import os
+import random
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import torch
+from transformers import Trainer
+from transformers.trainer import OPTIMIZER_NAME, SCALER_NAME, SCHEDULER_NAME, TRAINER_STATE_NAME
+from transformers.trainer_callback import ExportableState
+from transformers.trainer_utils import PREFIX_CHECKPOINT_DIR
+
+from ..quant.shards import sha256_file
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("checkpointing")
+
+MANIFEST_NAME = "checkpoint_manifest.json"
+TMP_PREFIX = ".tmp-"
+_CHECKPOINT_RE = re.compile(rf"^{PREFIX_CHECKPOINT_DIR}-(\d+)$")
+
+
+def _clone_to_cpu(obj: Any, memo: Optional[Dict[int, torch.Tensor]] = None) -> Any:
+    """Deep-copy nested containers, cloning tensors to CPU and preserving aliasing."""
+    if memo is None:
+        memo = {}
+    if isinstance(obj, torch.Tensor):
+        key = id(obj)
+        if key not in memo:
+            memo[key] = obj.detach().to("cpu", copy=True)
+        return memo[key]
+    if isinstance(obj, dict):
+        return type(obj)((k, _clone_to_cpu(v, memo)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_clone_to_cpu(v, memo) for v in obj)
+    return copy.deepcopy(obj)
+
+
+def _is_adapter_model(model) -> bool:
+    try:
+        from peft import PeftModel
+    except ImportError:
+        return False
+    return isinstance(model, PeftModel)
+
+
+def write_manifest(checkpoint_dir: Path, global_step: int) -> None:
+    """Record the size and SHA-256 of every file in ``checkpoint_dir``."""
+    files = {}
+    for path in sorted(p for p in checkpoint_dir.rglob("*")
+                       if p.is_file() and p.name != MANIFEST_NAME):
+        files[path.relative_to(checkpoint_dir).as_posix()] = {"size": path.stat().st_size,
+                                                              "sha256": sha256_file(path)}
+    manifest = {"global_step": global_step, "files": files}
+    (checkpoint_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2) + "\n")
+
+
+def verify_checkpoint(checkpoint_dir: str, checksums: bool = False) -> bool:
+    """Check a checkpoint against its manifest.
+
+    Args:
+        checkpoint_dir: ``checkpoint-N`` directory
+        checksums: Also re-hash every file (reads the whole checkpoint)
+
+    Returns:
+        True if every listed file is present with the recorded size (and hash)
+    """
+    root = Path(checkpoint_dir)
+    manifest_path = root / MANIFEST_NAME
+    if not manifest_path.exists():
+        return False
+    try:
+        files = json.loads(manifest_path.read_text())["files"]
+    except (ValueError, KeyError):
+        return False
+    for rel, meta in files.items():
+        path = root / rel
+        if not path.is_file() or path.stat().st_size != meta["size"]:
+            return False
+        if checksums and sha256_file(path) != meta["sha256"]:
+            return False
+    return True
+
+
+def find_latest_checkpoint(output_dir: str, checksums: bool = False) -> Optional[str]:
+    """Return the newest ``checkpoint-N`` in ``output_dir`` that passes verification."""
+    root = Path(output_dir)
+    if not root.is_dir():
+        return None
+    candidates = []
+    for path in root.iterdir():
+        match = _CHECKPOINT_RE.match(path.name)
+        if match and path.is_dir():
+            candidates.append((int(match.group(1)), path))
+    for step, path in sorted(candidates, reverse=True):
+        if verify_checkpoint(str(path), checksums):
+            return str(path)
+        logger.warning("Skipping incomplete or corrupt checkpoint %s", path)
+    return None
+
+
+def rotate_checkpoints(output_dir: str, save_total_limit: Optional[int],
+                       keep: Optional[str] = None) -> None:
+    """Delete the oldest checkpoints beyond ``save_total_limit``, never ``keep``."""
+    if not save_total_limit:
+        return
+    root = Path(output_dir)
+    checkpoints = sorted(
+        (int(m.group(1)), p) for p in root.iterdir()
+        if (m := _CHECKPOINT_RE.match(p.name)) and p.is_dir()
+    )
+    excess = len(checkpoints) - save_total_limit
+    for _, path in checkpoints:
+        if excess <= 0:
+            break
+        if keep and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        excess -= 1
+
+
+class _BackgroundWriter:
+    """Runs at most one write job at a time on a daemon thread."""
+
+    def __init__(self):
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def wait(self) -> None:
+        """Block until the pending write finishes; re-raise its failure."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Background checkpoint write failed") from error
+
+    def submit(self, job: Callable[[], None]) -> None:
+        self.wait()
+
+        def run() -> None:
+            try:
+                job()
+            except BaseException as e:  # surfaced on the next wait()
+                logger.exception("Background checkpoint write failed")
+                self._error = e
+
+        self._thread = threading.Thread(target=run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+
+class AsyncCheckpointTrainer(Trainer):
+    """``Trainer`` whose periodic checkpoints are serialized off the training thread."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._writer = _BackgroundWriter()
+
+    def _async_supported(self) -> bool:
+        return (
+            self.args.world_size == 1
+            and not self.is_deepspeed_enabled
+            and not self.is_fsdp_enabled
+            and not self.args.load_best_model_at_end
+            and not self.args.push_to_hub
+        )
+
+    def _rng_snapshot(self) -> Dict[str, Any]:
+        states = {
+            "python": random.getstate(),
+            "numpy": np.random.get_state(),
+            "cpu": torch.random.get_rng_state(),
+        }
+        if torch.cuda.is_available():
+            states["cuda"] = torch.cuda.random.get_rng_state()
+        return states
+
+    def _save_checkpoint(self, model, trial):
+        if not self._async_supported():
+            self._writer.wait()
+            super()._save_checkpoint(model, trial)
+            run_dir = Path(self._get_output_dir(trial=trial))
+            checkpoint_dir = run_dir / f"{PREFIX_CHECKPOINT_DIR}-{self.state.global_step}"
+            if self.args.should_save and checkpoint_dir.is_dir():
+                write_manifest(checkpoint_dir, self.state.global_step)
+            return
+
+        # Finish (and surface errors from) the previous write before taking a new snapshot
+        self._writer.wait()
+
+        if self.hp_search_backend is None and trial is None:
+            self.store_flos()
+        run_dir = self._get_output_dir(trial=trial)
+        final_dir = Path(run_dir) / f"{PREFIX_CHECKPOINT_DIR}-{self.state.global_step}"
+        tmp_dir = final_dir.with_name(TMP_PREFIX + final_dir.name)
+
+        # Phase 1: snapshot everything the write needs, on the training thread
+        memo: Dict[int, torch.Tensor] = {}
+        unwrapped = self.accelerator.unwrap_model(model)
+        if _is_adapter_model(unwrapped):
+            # Only the adapter weights change; don't copy the frozen base
+            model_state = {n: p for n, p in unwrapped.named_parameters() if p.requires_grad}
+        else:
+            model_state = unwrapped.state_dict()
+        model_state = _clone_to_cpu(model_state, memo)
+        optimizer_state = None
+        if not self.args.save_only_model:
+            optimizer_state = {
+                OPTIMIZER_NAME: _clone_to_cpu(self.optimizer.state_dict(), memo),
+                SCHEDULER_NAME: copy.deepcopy(self.lr_scheduler.state_dict()),
+                "rng_state.pth": self._rng_snapshot(),
+            }
+            scaler = getattr(self.accelerator, "scaler", None)
+            if scaler is not None:
+                optimizer_state[SCALER_NAME] = copy.deepcopy(scaler.state_dict())
+        stateful = self.callback_handler.callbacks + [self.control]
+        for cb in [cb for cb in stateful if isinstance(cb, ExportableState)]:
+            cb_name = cb.__class__.__name__
+            if isinstance(self.state.stateful_callbacks.get(cb_name), list):
+                self.state.stateful_callbacks[cb_name].append(cb.state())
+            else:
+                self.state.stateful_callbacks[cb_name] = cb.state()
+        trainer_state = copy.deepcopy(self.state)
+        global_step = self.state.global_step
+
+        # Phase 2: serialize, checksum and publish in the background
+        def write() -> None:
+            if tmp_dir.exists():
+                shutil.rmtree(tmp_dir)
+            tmp_dir.mkdir(parents=True)
+            self._save(str(tmp_dir), state_dict=model_state)
+            for name, obj in (optimizer_state or {}).items():
+                torch.save(obj, tmp_dir / name)
+            trainer_state.save_to_json(str(tmp_dir / TRAINER_STATE_NAME))
+            write_manifest(tmp_dir, global_step)
+            if final_dir.exists():
+                shutil.rmtree(final_dir)
+            os.replace(tmp_dir, final_dir)
+            rotate_checkpoints(run_dir, self.args.save_total_limit,
+                               keep=trainer_state.best_model_checkpoint)
+            logger.info("Checkpoint %s written", final_dir)
+
+        self._writer.submit(write)
+
+    def wait_for_checkpoint(self) -> None:
+        """Block until any in-flight checkpoint write has been published."""
+        self._writer.wait()
+
+    def train(self, *args, **kwargs):
+        try:
+            result = super().train(*args, **kwargs)
+        except BaseException:
+            # Let the last snapshot land, but keep the original error
+            try:
+                self._writer.wait()
+            except RuntimeError:
+                logger.exception("Checkpoint write failed while handling a training error")
+            raise
+        self._writer.wait()
+        return result
+
+
+def resume_checkpoint(output_dir: str, enabled: bool = True) -> Optional[str]:
+    """Pick the checkpoint to resume from, logging the decision."""
+    if not enabled:
+        return None
+    checkpoint = find_latest_checkpoint(output_dir)
+    if checkpoint:
+        logger.info("Resuming from %s", checkpoint)
+    return checkpoint
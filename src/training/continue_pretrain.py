@@ -1,31 +1,33 @@
-import os
 from datasets import load_dataset
-from transformers import AutoModelForCausalLM, AutoTokenizer, Trainer, TrainingArguments
-
-MODEL = os.getenv("BASE_MODEL", "internlm2/internlm2-7b")
+from transformers import AutoModelForCausalLM, AutoTokenizer, DataCollatorForLanguageModeling
+from src.training.checkpointing import AsyncCheckpointTrainer, resume_checkpoint
+from src.training.telemetry import ThroughputCallback
+from src.training.training_args import build_training_arguments
+from src.utils.config import get_config
 
 def main():
-    tok = AutoTokenizer.from_pretrained(MODEL, use_fast=True)
-    model = AutoModelForCausalLM.from_pretrained(MODEL)
-    ds = load_dataset("json", data_files={"train": "data/processed/domain_corpus.jsonl"})
+    config = get_config()
+    cfg = config.training.domain_pt
+    model_name = config.model.base_model
+
+    tok = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+    if tok.pad_token is None:
+        tok.pad_token = tok.eos_token
+    model = AutoModelForCausalLM.from_pretrained(model_name)
+    ds = load_dataset("json", data_files={"train": config.data.domain_corpus})
 
     def tok_fn(b):
-        return tok(b["text"], truncation=True, max_length=2048)
+        return tok(b["text"], truncation=True, max_length=cfg.get("max_length", 2048))
 
     ds = ds.map(tok_fn, batched=True, remove_columns=ds["train"].column_names)
 
-    args = TrainingArguments(
-        output_dir="runs/pt",
-        per_device_train_batch_size=2,
-        gradient_accumulation_steps=8,
-        learning_rate=2e-5,
-        num_train_epochs=1,
-        logging_steps=20, save_steps=500, save_total_limit=2,
-        fp16=False, bf16=True,
-    )
-    trainer = Trainer(model=model, args=args, train_dataset=ds["train"])
-    trainer.train()
-    trainer.save_model("artifacts/pt")
+    args = build_training_arguments(cfg)
+    collator = DataCollatorForLanguageModeling(tok, mlm=False)
+    trainer = AsyncCheckpointTrainer(model=model, args=args, data_collator=collator,
+                                     train_dataset=ds["train"], callbacks=[ThroughputCallback()])
+    resume = resume_checkpoint(args.output_dir, cfg.get("auto_resume", True))
+    trainer.train(resume_from_checkpoint=resume)
+    trainer.save_model(config.model.pt_checkpoint)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,40 @@
+"""LoRA (parameter-efficient) fine-tuning support for ``sft.py``."""
+
+from typing import Any, Dict
+
+from peft import LoraConfig, get_peft_model
+
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("lora")
+
+
+def apply_lora(model, cfg: Dict[str, Any], gradient_checkpointing: bool = False):
+    """Freeze ``model`` and attach trainable LoRA adapters.
+
+    Args:
+        model: Causal LM to adapt
+        cfg: The ``training.sft.lora`` config mapping
+        gradient_checkpointing: Whether the trainer will enable gradient
+            checkpointing (the frozen embeddings then need to emit grads)
+
+    Returns:
+        ``PeftModel`` wrapping ``model``
+    """
+    lora_config = LoraConfig(
+        r=cfg.get("r", 16),
+        lora_alpha=cfg.get("alpha", 32),
+        lora_dropout=cfg.get("dropout", 0.05),
+        target_modules=cfg.get("target_modules", "all-linear"),
+        bias="none",
+        task_type="CAUSAL_LM",
+    )
+    if gradient_checkpointing:
+        model.enable_input_require_grads()
+    model = get_peft_model(model, lora_config)
+
+    trainable = sum(p.numel() for p in model.parameters() if p.requires_grad)
+    total = sum(p.numel() for p in model.parameters())
+    logger.info("LoRA: training %d of %d parameters (%.3f%%)",
+                trainable, total, 100 * trainable / total)
+    return model
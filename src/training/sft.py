@@ -1,50 +1,81 @@
-import os
 from datasets import load_dataset
-from transformers import AutoTokenizer, AutoModelForCausalLM, Trainer, TrainingArguments, DataCollatorForLanguageModeling
+from transformers import AutoTokenizer, AutoModelForCausalLM, DataCollatorForLanguageModeling
 from src.cf_sft.augment import perturb
+from src.data.prompt_template import load_chat_template
+from src.data.sensor_encoder import SensorWindow, encode_batch
+from src.training.checkpointing import AsyncCheckpointTrainer, resume_checkpoint
+from src.training.lora import apply_lora
+from src.training.telemetry import ThroughputCallback
+from src.training.training_args import build_training_arguments
+from src.utils.config import get_config
 
-BASE = os.getenv("PT_CKPT", "artifacts/pt")
+def example_fields(ex, sensor_prompt=None):
+    """Template fields for one SFT row; serving builds the same ones in agent/prompts.py."""
+    return {
+        "context": sensor_prompt if sensor_prompt is not None else ex["sensor_prompt"],
+        "dialogue": ex["dialogue"],
+        "history": "".join(ex.get("history") or []),
+        "target": ex["target_response"],
+    }
+
+def batch_fields(b):
+    """Template fields for a columnar ``datasets`` batch.
+
+    Rows without a pre-rendered ``sensor_prompt`` are rendered from their raw
+    SensorWindow fields (e.g. after counterfactual perturbation) in one pass.
+    """
+    rows = [dict(zip(b, values)) for values in zip(*b.values())]
+    raw = [i for i, ex in enumerate(rows) if not ex.get("sensor_prompt")]
+    rendered = dict(zip(raw, encode_batch([SensorWindow.model_validate(rows[i]) for i in raw])))
+    return [example_fields(ex, rendered.get(i)) for i, ex in enumerate(rows)]
 
 def format_example(ex):
-    ctx = ex["sensor_prompt"]
-    convo = ex["dialogue"]
-    sys = open("prompts/system_therapist.md").read()
-    return f"<|system|>\n{sys}\n<|user|>\n{ctx}\n\n{convo}\n<|assistant|>\n{ex['target_response']}"
+    return load_chat_template().render(batch_fields({k: [v] for k, v in ex.items()})[0])
 
 def main():
-    ds = load_dataset("json", data_files={"train": "data/processed/sft.jsonl", "val": "data/processed/val.jsonl"})
+    config = get_config()
+    cfg = config.training.sft
+    base = config.model.pt_checkpoint
+
+    ds = load_dataset("json",
+                      data_files={"train": config.data.sft_train, "val": config.data.sft_val})
 
     cf = ds["train"].map(lambda e: perturb(e))
     ds["train"] = ds["train"].flatten_indices().concatenate(cf)
 
-    tok = AutoTokenizer.from_pretrained(BASE, use_fast=True)
+    tok = AutoTokenizer.from_pretrained(base, use_fast=True)
     tok.pad_token = tok.eos_token
 
+    template = load_chat_template()
+
     def tok_fn(b):
-        texts = [format_example(x) for x in b]
-        return tok(texts, truncation=True, max_length=2048)
+        return template.encode_batch(batch_fields(b), tok, max_length=cfg.get("max_length", 2048))
 
     ds = ds.map(tok_fn, batched=True, remove_columns=ds["train"].column_names)
 
-    model = AutoModelForCausalLM.from_pretrained(BASE)
+    model = AutoModelForCausalLM.from_pretrained(base)
     collator = DataCollatorForLanguageModeling(tok, mlm=False)
 
-    args = TrainingArguments(
-        output_dir="runs/sft",
-        per_device_train_batch_size=1,
-        gradient_accumulation_steps=16,
-        learning_rate=1e-5,
-        num_train_epochs=2,
-        bf16=True,
-        evaluation_strategy="steps",
-        eval_steps=500,
-        logging_steps=50,
-        save_steps=500,
-    )
-
-    trainer = Trainer(model=model, args=args, data_collator=collator, train_dataset=ds["train"], eval_dataset=ds["val"])
-    trainer.train()
-    trainer.save_model("artifacts/sft")
+    lora_cfg = cfg.get("lora") or {}
+    out_dir = config.model.sft_checkpoint
+    overrides = {}
+    if lora_cfg.get("enabled"):
+        model = apply_lora(model, lora_cfg,
+                           gradient_checkpointing=cfg.get("gradient_checkpointing", False))
+        out_dir = lora_cfg.get("output_dir", "artifacts/sft-lora")
+        # Own checkpoint dir, so auto_resume never picks up a full-SFT run (or vice versa)
+        overrides["output_dir"] = lora_cfg.get("run_dir", "runs/sft-lora")
+        if "learning_rate" in lora_cfg:
+            overrides["learning_rate"] = lora_cfg["learning_rate"]
+
+    args = build_training_arguments(cfg, **overrides)
+
+    trainer = AsyncCheckpointTrainer(model=model, args=args, data_collator=collator,
+                                     train_dataset=ds["train"], eval_dataset=ds["val"],
+                                     callbacks=[ThroughputCallback()])
+    resume = resume_checkpoint(args.output_dir, cfg.get("auto_resume", True))
+    trainer.train(resume_from_checkpoint=resume)
+    trainer.save_model(out_dir)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
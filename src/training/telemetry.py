@@ -0,0 +1,158 @@
+"""Throughput telemetry for HF ``Trainer`` runs.
+
+``ThroughputCallback`` splits each optimizer step into
+
+* **data wait** — fetching the step's micro-batches, measured from the end of
+  the previous step's logging/saving/evaluation to ``on_step_begin``;
+* **compute** — forward, backward and optimizer step, ``on_step_begin`` to
+  ``on_step_end`` (with a CUDA sync so queued kernels are counted);
+* **other** — logging, checkpointing and evaluation after the step.
+
+It logs interval tokens/sec, samples/sec and peak memory every
+``logging_steps`` and writes ``run_summary.json`` to the output directory when
+training ends.
+"""
+
+import json
+import resource
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import torch
+from transformers import TrainerCallback
+
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("telemetry")
+
+SUMMARY_NAME = "run_summary.json"
+
+# Fraction of step time spent waiting on data above which a run is input-bound
+INPUT_BOUND_THRESHOLD = 0.1
+
+
+def peak_memory_bytes() -> Dict[str, int]:
+    """Peak accelerator and host memory of this process."""
+    peak = {"host_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    if torch.cuda.is_available():
+        peak["cuda_allocated"] = torch.cuda.max_memory_allocated()
+    return peak
+
+
+class ThroughputCallback(TrainerCallback):
+    """Record throughput and a data-wait/compute breakdown for every step.
+
+    Args:
+        synchronize: Call ``torch.cuda.synchronize()`` at step boundaries so
+            compute time includes queued kernels
+    """
+
+    def __init__(self, synchronize: bool = True):
+        self.synchronize = synchronize and torch.cuda.is_available()
+        self._totals = {"data_wait": 0.0, "compute": 0.0, "other": 0.0}
+        self._interval = dict(self._totals)
+        self._steps = 0
+        self._interval_steps = 0
+        self._step_begin: Optional[float] = None
+        self._ready: Optional[float] = None
+        self._train_begin = 0.0
+        self._interval_begin = 0.0
+        self._tokens_at_begin = 0
+        self._tokens_at_interval = 0
+        self._samples_per_step = 1
+
+    def _now(self) -> float:
+        if self.synchronize:
+            torch.cuda.synchronize()
+        return time.perf_counter()
+
+    def _housekeeping_done(self) -> None:
+        """Mark the end of post-step work (log/save/evaluate); data fetch starts here."""
+        if self._ready is not None:
+            now = time.perf_counter()
+            self._interval["other"] += now - self._ready
+            self._ready = now
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self._samples_per_step = (args.per_device_train_batch_size
+                                  * args.gradient_accumulation_steps * args.world_size)
+        self._tokens_at_begin = self._tokens_at_interval = state.num_input_tokens_seen
+        self._train_begin = self._interval_begin = self._ready = time.perf_counter()
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+
+    def on_step_begin(self, args, state, control, **kwargs):
+        self._step_begin = self._now()
+        if self._ready is not None:
+            self._interval["data_wait"] += self._step_begin - self._ready
+
+    def on_step_end(self, args, state, control, **kwargs):
+        now = self._now()
+        if self._step_begin is not None:
+            self._interval["compute"] += now - self._step_begin
+        self._ready = now
+        self._steps += 1
+        self._interval_steps += 1
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        self._housekeeping_done()
+        if not state.is_world_process_zero or not self._interval_steps:
+            return
+        now = time.perf_counter()
+        elapsed = max(now - self._interval_begin, 1e-9)
+        stepped = sum(self._interval.values()) or 1e-9
+        tokens = state.num_input_tokens_seen - self._tokens_at_interval
+        logger.info(
+            "step %d: %.1f samples/s, %.1f tokens/s, data_wait %.1f%%, compute %.1f%%, peak %s",
+            state.global_step,
+            self._interval_steps * self._samples_per_step / elapsed,
+            tokens / elapsed,
+            100 * self._interval["data_wait"] / stepped,
+            100 * self._interval["compute"] / stepped,
+            peak_memory_bytes(),
+        )
+        self._flush_interval(now, state.num_input_tokens_seen)
+
+    def on_save(self, args, state, control, **kwargs):
+        self._housekeeping_done()
+
+    def on_evaluate(self, args, state, control, **kwargs):
+        self._housekeeping_done()
+
+    def _flush_interval(self, now: float, tokens_seen: int) -> None:
+        for key, value in self._interval.items():
+            self._totals[key] += value
+            self._interval[key] = 0.0
+        self._interval_steps = 0
+        self._interval_begin = now
+        self._tokens_at_interval = tokens_seen
+
+    def summary(self, state) -> Dict[str, Any]:
+        """Aggregate metrics for the run so far."""
+        wall = max(time.perf_counter() - self._train_begin, 1e-9)
+        totals = {k: self._totals[k] + self._interval[k] for k in self._totals}
+        stepped = sum(totals.values()) or 1e-9
+        tokens = state.num_input_tokens_seen - self._tokens_at_begin
+        data_wait_fraction = totals["data_wait"] / stepped
+        return {
+            "global_step": state.global_step,
+            "steps_timed": self._steps,
+            "wall_seconds": wall,
+            "samples_per_sec": self._steps * self._samples_per_step / wall,
+            "tokens_per_sec": tokens / wall if tokens else None,
+            "seconds": totals,
+            "mean_step_seconds": {k: v / max(self._steps, 1) for k, v in totals.items()},
+            "data_wait_fraction": data_wait_fraction,
+            "bound": "input" if data_wait_fraction > INPUT_BOUND_THRESHOLD else "compute",
+            "peak_memory_bytes": peak_memory_bytes(),
+        }
+
+    def on_train_end(self, args, state, control, **kwargs):
+        if not state.is_world_process_zero:
+            return
+        summary = self.summary(state)
+        out = Path(args.output_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        (out / SUMMARY_NAME).write_text(json.dumps(summary, indent=2) + "\n")
+        logger.info("Run summary (%s-bound): %s", summary["bound"], summary)
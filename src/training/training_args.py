@@ -0,0 +1,43 @@
+"""Build ``TrainingArguments`` from the ``training.*`` sections of config.yaml."""
+
+import dataclasses
+from typing import Any, Dict
+
+from transformers import TrainingArguments
+
+from ..utils.logging_setup import get_logger
+
+logger = get_logger("training_args")
+
+# Config keys renamed across transformers releases: old name -> new name
+_ALIASES = {"evaluation_strategy": "eval_strategy"}
+
+
+def build_training_arguments(section: Dict[str, Any], **overrides: Any) -> TrainingArguments:
+    """Create ``TrainingArguments`` from a config section.
+
+    Keys that are not ``TrainingArguments`` fields (e.g. ``max_length``) are
+    left for the calling script; renamed fields are mapped to whichever name
+    the installed transformers version accepts.
+
+    Args:
+        section: A ``training.domain_pt`` / ``training.sft`` config mapping
+        **overrides: Values that take precedence over the config
+
+    Returns:
+        Configured ``TrainingArguments``
+    """
+    fields = {f.name for f in dataclasses.fields(TrainingArguments) if f.init}
+    kwargs: Dict[str, Any] = {}
+    for key, value in {**section, **overrides}.items():
+        if key not in fields:
+            for old, new in _ALIASES.items():
+                if key == old and new in fields:
+                    key = new
+                elif key == new and old in fields:
+                    key = old
+        if key in fields:
+            kwargs[key] = value
+        else:
+            logger.debug("Ignoring non-TrainingArguments key %s", key)
+    return TrainingArguments(**kwargs)
@@ -1,6 +1,7 @@
 """Utility modules for configuration, logging, and common functions."""
 
-from .config import load_config
-from .logging_setup import setup_logging
+from .config import AppConfig, ConfigStore, get_config, load_config
+from .logging_setup import setup_logging, shutdown_logging
 
-__all__ = ["load_config", "setup_logging"]
+__all__ = ["AppConfig", "ConfigStore", "get_config", "load_config", "setup_logging",
+           "shutdown_logging"]
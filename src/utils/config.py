@@ -1,82 +1,365 @@
-"""Configuration management for the edge mental health agent."""
+"""Configuration management for the edge mental health agent.
 
+The YAML file is parsed, env-overridden and validated once per process and
+cached in a :class:`ConfigStore`. Subsequent accesses only re-read the file
+when its mtime changes (checked at most every ``check_interval`` seconds) or
+when one of the override environment variables changes, so config lookups on
+the request path cost a few dictionary reads.
+"""
+
+import copy
+import logging
 import os
+import threading
+import time
 import yaml
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from pydantic import BaseModel, ConfigDict, Field
+
+logger = logging.getLogger("edge_mental_health_agent.config")
+
+# Environment variables consulted by _override_with_env. A change to any of
+# them invalidates the cached configuration.
+_ENV_OVERRIDES = ("BASE_MODEL", "PT_CKPT", "SFT_CKPT", "HF_DIR", "MLC_OUT", "TARGET", "MEMORY_DIR",
+                  "LOG_FILE")
+
+
+class _Section(BaseModel):
+    """Base for config sections; unknown keys are kept for forward compatibility."""
+    model_config = ConfigDict(extra="allow")
+
+
+class ModelConfig(_Section):
+    base_model: str
+    pt_checkpoint: str = "artifacts/pt"
+    sft_checkpoint: str = "artifacts/sft"
+    hf_export_dir: str = "artifacts/hf_export"
+    max_new_tokens: int = Field(300, gt=0)
+    temperature: float = Field(0.7, gt=0.0, le=2.0)
+    top_p: float = Field(0.9, gt=0.0, le=1.0)
+    stop_strings: List[str] = Field(
+        default_factory=lambda: ["<|user|>", "<|system|>", "<|history|>"])
+    max_time_s: Optional[float] = Field(None, gt=0.0)
+    min_time_s: float = Field(0.5, ge=0.0)
+    min_new_tokens: int = Field(48, gt=0)
+    queue_soft_limit: int = Field(1, ge=0)
+    adapters: Dict[str, str] = Field(default_factory=dict)
+    default_adapter: Union[None, str, List[str]] = None
+    checkpoints: Dict[str, str] = Field(default_factory=dict)
+    memory_budget_mb: Optional[int] = Field(None, gt=0)
+    warmup_prompt: Optional[str] = "Hello"
+
+
+class TrainingConfig(_Section):
+    domain_pt: Dict[str, Any] = Field(default_factory=dict)
+    sft: Dict[str, Any] = Field(default_factory=dict)
+
+
+class DataConfig(_Section):
+    raw_dir: str = "data/raw"
+    processed_dir: str = "data/processed"
+    domain_corpus: str = "data/processed/domain_corpus.jsonl"
+    sft_train: str = "data/processed/sft.jsonl"
+    sft_val: str = "data/processed/val.jsonl"
+
+
+class SensorConfig(_Section):
+    window_days: int = Field(14, gt=0)
+    ranges: Dict[str, Tuple[float, float]] = Field(default_factory=dict)
+
+
+class AugmentationConfig(_Section):
+    perturbation_probability: float = Field(0.6, ge=0.0, le=1.0)
+    noise_ranges: Dict[str, Any] = Field(default_factory=dict)
+
+
+class QuantizationConfig(_Section):
+    preset: str = "q4f16_1"
+    mlc_output_dir: str = "mobile/mlc-models"
+    targets: List[str] = Field(default_factory=lambda: ["android", "ios"])
+
+
+class SafetyConfig(_Section):
+    emergency_keywords: List[str] = Field(min_length=1)
+    emergency_helplines: Dict[str, str] = Field(default_factory=dict)
+
+
+class LoggingConfig(_Section):
+    level: str = "INFO"
+    format: str = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    file: Optional[str] = None
+    async_mode: bool = Field(False, alias="async")
+    json_format: bool = Field(False, alias="json")
+    queue_size: int = Field(10000, gt=0)
+    rate_limit_per_sec: Optional[float] = Field(None, gt=0.0)
+    rate_limit_burst: Optional[float] = Field(None, gt=0.0)
+    sample_rate: float = Field(1.0, ge=0.0, le=1.0)
+
+
+class MemoryConfig(_Section):
+    enabled: bool = True
+    keep_recent_turns: int = Field(6, ge=0)
+    summarize_every: int = Field(8, gt=0)
+    summary_max_words: int = Field(60, gt=0)
+    top_k: int = Field(4, ge=0)
+    token_budget: int = Field(256, ge=0)
+    embedding_dim: int = Field(256, gt=0)
+    ivf_threshold: int = Field(1024, gt=0)
+    nprobe: int = Field(4, gt=0)
+    persist_dir: Optional[str] = None
+
+
+class ServingConfig(_Section):
+    workers: Optional[int] = Field(None, gt=0)
+    cores_per_worker: int = Field(4, gt=0)
+    mmap_weights: bool = True
+    request_timeout: float = Field(120.0, gt=0.0)
+    health_interval: float = Field(10.0, gt=0.0)
+    startup_timeout: float = Field(600.0, gt=0.0)
+
+
+class DevConfig(_Section):
+    debug: bool = False
+    mock_model_responses: bool = False
+    test_data_size: int = 100
+
+
+class AppConfig(_Section):
+    """Typed, validated view of ``config.yaml``."""
+    model: ModelConfig
+    training: TrainingConfig
+    data: DataConfig
+    sensor: SensorConfig = Field(default_factory=SensorConfig)
+    augmentation: AugmentationConfig = Field(default_factory=AugmentationConfig)
+    quantization: QuantizationConfig
+    safety: SafetyConfig
+    logging: LoggingConfig = Field(default_factory=LoggingConfig)
+    memory: MemoryConfig = Field(default_factory=MemoryConfig)
+    serving: ServingConfig = Field(default_factory=ServingConfig)
+    dev: DevConfig = Field(default_factory=DevConfig)
+
+
+def _resolve_path(config_path: str) -> Path:
+    """Resolve a config path, falling back to the project root."""
+    if not os.path.exists(config_path):
+        # Try relative to project root
+        project_root = Path(__file__).parent.parent.parent
+        config_path = project_root / config_path
+
+    if not os.path.exists(config_path):
+        raise FileNotFoundError(f"Configuration file not found: {config_path}")
+
+    return Path(config_path)
+
+
+def _env_snapshot() -> Tuple[Optional[str], ...]:
+    return tuple(os.environ.get(name) for name in _ENV_OVERRIDES)
+
+
+class ConfigStore:
+    """Process-wide cache for a single configuration file.
+
+    Args:
+        config_path: Path to the YAML file (resolved like :func:`load_config`)
+        check_interval: Minimum seconds between mtime checks; 0 checks on
+            every access
+    """
+
+    def __init__(self, config_path: str = "config.yaml", check_interval: float = 1.0):
+        self.path = _resolve_path(config_path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[AppConfig], None]] = []
+        self._raw: Optional[Dict[str, Any]] = None
+        self._typed: Optional[AppConfig] = None
+        self._mtime_ns: Optional[int] = None
+        self._env: Optional[Tuple[Optional[str], ...]] = None
+        self._next_check = 0.0
+
+    def _is_stale(self, throttle: bool = True) -> bool:
+        if self._raw is None or self._env != _env_snapshot():
+            return True
+        if throttle:
+            now = time.monotonic()
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+        try:
+            return os.stat(self.path).st_mtime_ns != self._mtime_ns
+        except FileNotFoundError:
+            # Keep serving the last good config while the file is being replaced
+            return False
+
+    def _load(self, force: bool = False) -> bool:
+        """Parse, override and validate the file. Returns True if reloaded."""
+        with self._lock:
+            if not force and not self._is_stale(throttle=False):
+                return False
+            mtime_ns = os.stat(self.path).st_mtime_ns
+            env = _env_snapshot()
+            try:
+                with open(self.path, 'r') as f:
+                    raw = yaml.safe_load(f)
+                raw = _override_with_env(raw)
+                typed = AppConfig.model_validate(raw)
+                self._raw, self._typed = raw, typed
+            finally:
+                # Record what we attempted so a broken file is not re-parsed on
+                # every access; it is retried once it changes again. Only after
+                # the new config is in place: lock-free readers that see the new
+                # stamp must not get the old config.
+                self._mtime_ns, self._env = mtime_ns, env
+            self._next_check = time.monotonic() + self.check_interval
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(typed)
+            except Exception:
+                logger.exception("Config subscriber %r failed", callback)
+        return True
+
+    def _refresh(self) -> None:
+        if not self._is_stale():
+            return
+        try:
+            self._load()
+        except Exception:
+            if self._raw is None:
+                raise
+            # A broken edit must not take down a running process
+            logger.exception("Config reload from %s failed; keeping previous config", self.path)
+
+    def reload(self) -> AppConfig:
+        """Re-read the file unconditionally and return the new configuration."""
+        self._load(force=True)
+        return self._typed
+
+    def get(self) -> AppConfig:
+        """Return the typed configuration, reloading it if the file changed."""
+        self._refresh()
+        return self._typed
+
+    def raw(self) -> Dict[str, Any]:
+        """Return the cached configuration dictionary.
+
+        The dictionary is shared across callers and must not be mutated.
+        """
+        self._refresh()
+        return self._raw
+
+    def subscribe(self, callback: Callable[[AppConfig], None]) -> Callable[[], None]:
+        """Register ``callback`` to be invoked with the new config after each reload.
+
+        Returns:
+            A function that removes the subscription
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+
+_stores: Dict[str, ConfigStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(config_path: str = "config.yaml") -> ConfigStore:
+    """Return the shared :class:`ConfigStore` for ``config_path``."""
+    store = _stores.get(config_path)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(config_path)
+            if store is None:
+                store = _stores[config_path] = ConfigStore(config_path)
+    return store
+
+
+def get_config(config_path: str = "config.yaml") -> AppConfig:
+    """Return the cached, typed configuration."""
+    return get_store(config_path).get()
+
+
+def subscribe(callback: Callable[[AppConfig], None],
+              config_path: str = "config.yaml") -> Callable[[], None]:
+    """Subscribe to hot reloads of ``config_path``. See :meth:`ConfigStore.subscribe`."""
+    return get_store(config_path).subscribe(callback)
 
 
 def load_config(config_path: str = "config.yaml") -> Dict[str, Any]:
     """Load configuration from YAML file.
-    
+
     Args:
         config_path: Path to the configuration file
-        
+
     Returns:
-        Configuration dictionary
-        
+        Configuration dictionary (a private copy the caller may modify)
+
     Raises:
         FileNotFoundError: If config file doesn't exist
         yaml.YAMLError: If config file is invalid YAML
+        ValueError: If config values fail validation
     """
-    if not os.path.exists(config_path):
-        # Try relative to project root
-        project_root = Path(__file__).parent.parent.parent
-        config_path = project_root / config_path
-        
-    if not os.path.exists(config_path):
-        raise FileNotFoundError(f"Configuration file not found: {config_path}")
-        
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
-        
-    # Override with environment variables
-    config = _override_with_env(config)
-    
-    return config
+    return copy.deepcopy(get_store(config_path).raw())
 
 
 def _override_with_env(config: Dict[str, Any]) -> Dict[str, Any]:
     """Override configuration with environment variables."""
-    
+
     # Model overrides
     if "BASE_MODEL" in os.environ:
         config["model"]["base_model"] = os.environ["BASE_MODEL"]
     if "PT_CKPT" in os.environ:
-        config["model"]["pt_checkpoint"] = os.environ["PT_CKPT"]  
+        config["model"]["pt_checkpoint"] = os.environ["PT_CKPT"]
     if "SFT_CKPT" in os.environ:
         config["model"]["sft_checkpoint"] = os.environ["SFT_CKPT"]
     if "HF_DIR" in os.environ:
         config["model"]["hf_export_dir"] = os.environ["HF_DIR"]
-        
+
     # Quantization overrides
     if "MLC_OUT" in os.environ:
         config["quantization"]["mlc_output_dir"] = os.environ["MLC_OUT"]
     if "TARGET" in os.environ:
         config["quantization"]["targets"] = [os.environ["TARGET"]]
-        
+
+    # Memory overrides
+    if "MEMORY_DIR" in os.environ:
+        config.setdefault("memory", {})["persist_dir"] = os.environ["MEMORY_DIR"]
+
+    # Logging overrides
+    if "LOG_FILE" in os.environ:
+        config.setdefault("logging", {})["file"] = os.environ["LOG_FILE"]
+
     return config
 
 
 def get_model_config() -> Dict[str, Any]:
-    """Get model-specific configuration."""
-    config = load_config()
-    return config["model"]
+    """Get model-specific configuration (shared; do not mutate)."""
+    return get_store().raw()["model"]
 
 
 def get_training_config() -> Dict[str, Any]:
-    """Get training-specific configuration."""
-    config = load_config()
-    return config["training"]
+    """Get training-specific configuration (shared; do not mutate)."""
+    return get_store().raw()["training"]
 
 
 def get_data_config() -> Dict[str, Any]:
-    """Get data-specific configuration."""
-    config = load_config()
-    return config["data"]
+    """Get data-specific configuration (shared; do not mutate)."""
+    return get_store().raw()["data"]
 
 
 def get_safety_config() -> Dict[str, Any]:
-    """Get safety-specific configuration."""  
-    config = load_config()
-    return config["safety"]
+    """Get safety-specific configuration (shared; do not mutate)."""
+    return get_store().raw()["safety"]
+
+
+def get_memory_config() -> Dict[str, Any]:
+    """Get conversational-memory configuration (shared; do not mutate)."""
+    return get_store().raw().get("memory") or {}
@@ -1,62 +1,259 @@
-"""Logging setup for the edge mental health agent."""
+"""Logging setup for the edge mental health agent.
 
+In async mode (``logging.async: true``) callers only merge the message with
+its arguments (so later mutation of an argument cannot change the line) and
+enqueue the record; formatting, JSON encoding and disk/console I/O happen on
+a background ``QueueListener`` thread. The queue is bounded and records are
+dropped rather than blocking when it is full, so a slow disk can never stall
+inference.
+"""
+
+import atexit
+import copy
+import json
 import logging
-import os
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
+
+from .config import LoggingConfig, get_config
+
+# Attributes present on every LogRecord; anything else came from ``extra=``
+_RESERVED_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including ``extra`` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Per-logger token bucket for records below WARNING.
+
+    Args:
+        rate: Sustained records per second allowed for each logger name
+        burst: Bucket capacity (defaults to ``rate``)
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                bucket = self._buckets[record.name] = [self.burst, now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1.0:
+                bucket[0] = tokens
+                self.dropped += 1
+                return False
+            bucket[0] = tokens - 1.0
+            return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a random fraction of records below WARNING.
+
+    Args:
+        sample_rate: Probability of keeping a record, in [0, 1]
+    """
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.sample_rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that never blocks the caller.
+
+    ``prepare`` merges the message and its arguments in the calling thread,
+    like the stock ``QueueHandler``, but leaves the rest of the formatting
+    (timestamp layout, JSON, traceback text) to the listener thread. Records
+    are dropped (and counted) when the queue is full.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
 
-from .config import load_config
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Copy so other handlers in the chain still see the original record
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        return record
 
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
-def setup_logging(level: Optional[str] = None, log_file: Optional[str] = None) -> logging.Logger:
+
+class _DrainingQueueListener(logging.handlers.QueueListener):
+    """``QueueListener`` whose stop waits for room for its sentinel.
+
+    The stock ``enqueue_sentinel`` uses ``put_nowait`` and raises
+    ``queue.Full`` on a saturated queue. Producers are detached before
+    :func:`shutdown_logging` stops the listener, so the queue only drains
+    from then on and a bounded wait is enough.
+    """
+
+    sentinel_timeout = 5.0
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel, timeout=self.sentinel_timeout)
+
+
+def shutdown_logging() -> None:
+    """Stop the background writer, draining queued records, and flush handlers."""
+    global _listener, _queue_handler
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    handler, _queue_handler = _queue_handler, None
+    if handler is not None:
+        if handler.dropped:
+            logging.getLogger("edge_mental_health_agent").warning(
+                "Dropped %d log records because the logging queue was full", handler.dropped
+            )
+        # Detach first: records logged after shutdown must not land in an undrained queue
+        logging.getLogger().removeHandler(handler)
+        handler.close()
+    try:
+        listener.stop()
+    except queue.Full:
+        # The writer thread is stuck; it is a daemon thread, so don't hang the exit on it
+        print("Logging writer did not drain its queue; some records were lost", file=sys.stderr)
+    for out in listener.handlers:
+        out.flush()
+        out.close()
+
+
+atexit.register(shutdown_logging)
+
+
+def setup_logging(
+    level: Optional[str] = None,
+    log_file: Optional[str] = None,
+    async_mode: Optional[bool] = None,
+    json_format: Optional[bool] = None,
+) -> logging.Logger:
     """Setup logging configuration.
-    
+
     Args:
         level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         log_file: Path to log file
-        
+        async_mode: Write records from a background thread via a bounded queue
+        json_format: Emit structured JSON lines instead of ``logging.format``
+
     Returns:
         Configured logger instance
     """
+    global _listener, _queue_handler
     try:
-        config = load_config()
-        logging_config = config.get("logging", {})
-    except (FileNotFoundError, KeyError):
-        logging_config = {}
-    
+        logging_config = get_config().logging
+    except (FileNotFoundError, KeyError, ValueError):
+        logging_config = LoggingConfig()
+
     # Use provided arguments or fall back to config or defaults
-    level = level or logging_config.get("level", "INFO")
-    log_format = logging_config.get("format", "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    log_file = log_file or logging_config.get("file")
-    
+    level = level or logging_config.level
+    log_format = logging_config.format
+    log_file = log_file or logging_config.file
+    if async_mode is None:
+        async_mode = logging_config.async_mode
+    if json_format is None:
+        json_format = logging_config.json_format
+
     # Create logs directory if needed
     if log_file:
         log_path = Path(log_file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
-    
+
     # Configure logging
     handlers = [logging.StreamHandler()]
     if log_file:
         handlers.append(logging.FileHandler(log_file))
-    
+    formatter = JsonFormatter() if json_format else logging.Formatter(log_format)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    filters: List[logging.Filter] = []
+    if logging_config.rate_limit_per_sec:
+        filters.append(RateLimitFilter(logging_config.rate_limit_per_sec,
+                                       logging_config.rate_limit_burst))
+    if logging_config.sample_rate < 1.0:
+        filters.append(SamplingFilter(logging_config.sample_rate))
+
+    # Replace any previous background writer before reconfiguring
+    shutdown_logging()
+
+    if async_mode:
+        log_queue: queue.Queue = queue.Queue(maxsize=logging_config.queue_size)
+        _queue_handler = NonBlockingQueueHandler(log_queue)
+        _listener = _DrainingQueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        root_handlers = [_queue_handler]
+    else:
+        root_handlers = handlers
+
+    # Filters run in the caller thread so dropped records are never enqueued
+    for handler in root_handlers:
+        for log_filter in filters:
+            handler.addFilter(log_filter)
+
     logging.basicConfig(
         level=getattr(logging, level.upper()),
-        format=log_format,
-        handlers=handlers,
+        handlers=root_handlers,
         force=True  # Override any existing configuration
     )
-    
+
     logger = logging.getLogger("edge_mental_health_agent")
-    
+
     return logger
 
 
 def get_logger(name: str) -> logging.Logger:
     """Get a logger with the specified name.
-    
+
     Args:
         name: Name for the logger
-        
+
     Returns:
         Logger instance
     """
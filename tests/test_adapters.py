@@ -0,0 +1,133 @@
+"""Tests for LoRA training and adapter serving on a shared base model."""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("peft")
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.agent.adapters import AdapterManager
+from src.training.lora import apply_lora
+
+
+def _base():
+    from transformers import GPT2Config, GPT2LMHeadModel
+
+    torch.manual_seed(0)
+    config = GPT2Config(vocab_size=64, n_embd=16, n_layer=1, n_head=2, n_positions=32)
+    return GPT2LMHeadModel(config).eval()
+
+
+def _save_adapter(path, seed):
+    from peft import LoraConfig, get_peft_model
+
+    base = _base()
+    torch.manual_seed(seed)
+    config = LoraConfig(r=4, target_modules=["c_attn"], init_lora_weights=False,
+                        task_type="CAUSAL_LM")
+    get_peft_model(base, config).save_pretrained(str(path))
+    return str(path)
+
+
+def _lora_layer(model):
+    return next(m for m in model.modules() if hasattr(m, "lora_A") and hasattr(m, "merged"))
+
+
+@torch.no_grad()
+def _logits(model):
+    return model(input_ids=torch.arange(8).unsqueeze(0)).logits
+
+
+def test_apply_lora_trains_only_adapters():
+    model = apply_lora(_base(), {"r": 4, "target_modules": ["c_attn"]})
+    trainable = [n for n, p in model.named_parameters() if p.requires_grad]
+    assert trainable and all("lora_" in n for n in trainable)
+
+
+def test_adapters_share_base_switch_stack_and_merge(tmp_path):
+    """Adapters change outputs independently; merge matches the unmerged adapter."""
+    manager = AdapterManager(_base(), {"a": _save_adapter(tmp_path / "a", 1),
+                                       "b": _save_adapter(tmp_path / "b", 2)})
+
+    with manager.activate() as model:
+        base = _logits(model)
+    with manager.activate("a") as model:
+        a = _logits(model)
+    with manager.activate("b") as model:
+        b = _logits(model)
+    with manager.activate(["a", "b"]) as model:
+        ab = _logits(model)
+
+    assert not torch.allclose(base, a) and not torch.allclose(a, b)
+    assert not torch.allclose(ab, a) and not torch.allclose(ab, b)
+
+    manager.merge("a")
+    with manager.activate("a") as model:
+        assert manager.merged == "a" and _lora_layer(model).merged
+        assert torch.allclose(_logits(model), a, atol=1e-5)
+    with manager.activate("b") as model:
+        assert manager.merged is None and not _lora_layer(model).merged
+        assert torch.allclose(_logits(model), b, atol=1e-5)
+
+    manager.unload("b")
+    with pytest.raises(ValueError):
+        with manager.activate("b"):
+            pass
+    with manager.activate() as model:
+        assert torch.allclose(_logits(model), base, atol=1e-5)
+
+
+def test_same_selection_runs_concurrently(tmp_path):
+    manager = AdapterManager(_base(), {"a": _save_adapter(tmp_path / "a", 1)})
+    entered = threading.Barrier(2, timeout=10)
+
+    def request():
+        with manager.activate("a"):
+            entered.wait()  # both requests are inside at once
+
+    threads = [threading.Thread(target=request) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not entered.broken
+
+    # A different selection waits for in-flight requests instead of switching under them
+    switched = threading.Event()
+
+    def base_request():
+        with manager.activate(None):
+            switched.set()
+
+    with manager.activate("a"):
+        other = threading.Thread(target=base_request)
+        other.start()
+        assert not switched.wait(0.2)
+    other.join(timeout=10)
+    assert switched.is_set()
+
+
+def test_no_adapters_means_no_lock():
+    manager = AdapterManager(_base())
+    with manager.activate() as outer, manager.activate() as inner:
+        assert outer is inner is manager.base_model
+    with pytest.raises(ValueError):
+        manager.activate("missing")
+
+
+def test_sync_follows_config(tmp_path):
+    a1, a2, b = (_save_adapter(tmp_path / n, seed) for n, seed in (("a1", 1), ("a2", 3), ("b", 2)))
+    manager = AdapterManager(_base(), {"a": a1, "b": b})
+    with manager.activate("a") as model:
+        before = _logits(model)
+    manager.sync({"a": a2})
+    assert manager.paths == {"a": a2}
+    with manager.activate("a") as model:
+        assert not torch.allclose(_logits(model), before)
@@ -0,0 +1,90 @@
+"""Tests for the incremental MLC build pipeline using a stub mlc_llm."""
+
+import json
+import os
+import stat
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.quant.build_mlc import MLCBuilder
+from src.quant.export_hf import MANIFEST_NAME
+from src.quant.shards import sha256_file
+
+STUB = """#!{python}
+import json, os, sys
+with open({log!r}, "a") as f:
+    f.write(json.dumps(sys.argv[1:]) + "\\n")
+args = sys.argv[1:]
+flag = "--output" if "--output" in args else "--artifact-path"
+out = args[args.index(flag) + 1]
+os.makedirs(out, exist_ok=True)
+"""
+
+
+def _setup(tmp_path):
+    hf = tmp_path / "hf"
+    hf.mkdir()
+    (hf / "config.json").write_text("{}")
+    (hf / "model.safetensors").write_bytes(b"weights-v1")
+    log = tmp_path / "calls.log"
+    stub = tmp_path / "mlc_llm"
+    stub.write_text(STUB.format(python=sys.executable, log=str(log)))
+    stub.chmod(stub.stat().st_mode | stat.S_IEXEC)
+    return hf, log, MLCBuilder(str(hf), str(tmp_path / "out"), mlc_llm=str(stub))
+
+
+def _calls(log):
+    return [json.loads(line)[0] for line in log.read_text().splitlines()] if log.exists() else []
+
+
+def test_convert_is_shared_and_reruns_are_skipped(tmp_path):
+    """One conversion feeds both targets; an unchanged rerun runs nothing."""
+    hf, log, builder = _setup(tmp_path)
+
+    results = builder.run(["android", "ios"])
+    assert sorted(_calls(log)) == ["build", "build", "convert-weight"]
+    steps = ["hash-inputs", "convert-weight", "build[android]", "build[ios]"]
+    assert [r.step for r in results] == steps
+    assert (tmp_path / "out" / "android").is_dir() and (tmp_path / "out" / "ios").is_dir()
+
+    log.unlink()
+    results = builder.run(["android", "ios"])
+    assert _calls(log) == []
+    assert all(r.skipped for r in results[1:])
+
+
+def test_changed_weights_and_new_targets_rebuild(tmp_path):
+    """Changing weights reruns everything; adding a target builds only that target."""
+    hf, log, builder = _setup(tmp_path)
+    builder.run(["android"])
+
+    log.unlink()
+    builder.run(["android", "ios"])
+    assert _calls(log) == ["build"]
+
+    log.unlink()
+    (hf / "model.safetensors").write_bytes(b"weights-v2")
+    builder.run(["android", "ios"])
+    assert sorted(_calls(log)) == ["build", "build", "convert-weight"]
+
+
+def test_stale_export_manifest_is_not_trusted(tmp_path):
+    """Weights rewritten behind the manifest's back (e.g. a legacy re-export) still rebuild."""
+    hf, log, builder = _setup(tmp_path)
+    shard = hf / "model.safetensors"
+    stat = shard.stat()
+    entry = {"key": "k", "sha256": sha256_file(shard), "size": stat.st_size,
+             "mtime_ns": stat.st_mtime_ns}
+    manifest = {"dtype": None, "shards": {"model.safetensors": entry}}
+    (hf / MANIFEST_NAME).write_text(json.dumps(manifest))
+    builder.run(["android"])
+
+    log.unlink()
+    shard.write_bytes(b"weights-v2")
+    os.utime(shard, ns=(entry["mtime_ns"] + 10**9, entry["mtime_ns"] + 10**9))
+    builder.run(["android"])
+    assert sorted(_calls(log)) == ["build", "convert-weight"]
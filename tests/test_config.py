@@ -9,7 +9,8 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent  
 sys.path.insert(0, str(project_root))
 
-from src.utils.config import load_config, get_model_config, get_safety_config
+from src.utils.config import (ConfigStore, get_config, load_config, get_model_config,
+                              get_safety_config)
 
 
 def test_load_config():
@@ -83,5 +84,104 @@ def test_config_validation():
     assert "us" in config["safety"]["emergency_helplines"]
 
 
+def test_typed_config_is_cached():
+    """Repeated access returns the same parsed object without re-reading YAML."""
+    first = get_config()
+    assert get_config() is first
+    assert first.model.max_new_tokens == get_model_config()["max_new_tokens"]
+    assert get_safety_config() is get_safety_config()
+
+
+def test_load_config_returns_private_copy():
+    """Mutating the legacy dict must not leak into the shared cache."""
+    config = load_config()
+    config["model"]["temperature"] = 99.0
+    assert get_model_config()["temperature"] != 99.0
+
+
+def _write_config(path, temperature):
+    path.write_text(
+        "model:\n"
+        "  base_model: tiny\n"
+        f"  temperature: {temperature}\n"
+        "training: {}\n"
+        "data: {}\n"
+        "quantization: {}\n"
+        "safety:\n"
+        "  emergency_keywords: [suicide]\n"
+    )
+
+
+def test_mtime_reload_and_subscribe(tmp_path):
+    """The store reloads on mtime change and notifies subscribers."""
+    path = tmp_path / "config.yaml"
+    _write_config(path, 0.5)
+    store = ConfigStore(str(path), check_interval=0)
+    seen = []
+    unsubscribe = store.subscribe(lambda cfg: seen.append(cfg.model.temperature))
+
+    assert store.get().model.temperature == 0.5
+    assert store.get() is store.get()
+
+    _write_config(path, 0.9)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert store.get().model.temperature == 0.9
+    assert seen == [0.5, 0.9]
+
+    unsubscribe()
+    store.reload()
+    assert seen == [0.5, 0.9]
+
+
+def test_invalid_reload_keeps_previous_config(tmp_path):
+    """A reload that fails validation keeps serving the last good config."""
+    path = tmp_path / "config.yaml"
+    _write_config(path, 0.5)
+    store = ConfigStore(str(path), check_interval=0)
+    assert store.get().model.temperature == 0.5
+
+    _write_config(path, 5.0)  # out of range
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert store.get().model.temperature == 0.5
+
+    with pytest.raises(ValueError):
+        ConfigStore(str(path)).get()
+
+
+def test_reader_during_reload_never_gets_stale_config(tmp_path, monkeypatch):
+    """A lock-free reader racing a reload must not see the old config under the new stamp."""
+    import threading
+    import src.utils.config as config_module
+
+    path = tmp_path / "config.yaml"
+    _write_config(path, 0.5)
+    store = ConfigStore(str(path), check_interval=3600)
+    assert store.get().memory.persist_dir is None
+
+    validate = config_module.AppConfig.model_validate
+    parsing, release = threading.Event(), threading.Event()
+
+    def slow_validate(raw):
+        parsing.set()
+        release.wait(5)
+        return validate(raw)
+
+    monkeypatch.setattr(config_module.AppConfig, "model_validate", slow_validate)
+    monkeypatch.setenv("MEMORY_DIR", str(tmp_path / "memory"))
+    results = []
+    reloader = threading.Thread(target=lambda: results.append(store.get()))
+    reloader.start()
+    assert parsing.wait(5)
+    reader = threading.Thread(target=lambda: results.append(store.get()))
+    reader.start()
+    reader.join(0.2)
+    release.set()
+    reloader.join(5)
+    reader.join(5)
+    assert [cfg.memory.persist_dir for cfg in results] == [str(tmp_path / "memory")] * 2
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
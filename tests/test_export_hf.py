@@ -0,0 +1,84 @@
+"""Tests for the streaming HF export."""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+from safetensors.torch import load_file, save_file
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.quant.export_hf import MANIFEST_NAME, parse_size, stream_export
+
+
+def _make_checkpoint(path):
+    path.mkdir()
+    weights = {f"layer{i}.weight": torch.randn(16, 16) for i in range(4)}
+    save_file(weights | {"step": torch.tensor([1])}, str(path / "model.safetensors"))
+    (path / "config.json").write_text(json.dumps({"torch_dtype": "float32"}))
+    (path / "tokenizer.json").write_text("{}")
+    (path / "optimizer.pt").write_bytes(b"state")
+
+
+def test_parse_size():
+    assert parse_size("2GB") == 2_000_000_000
+    assert parse_size("500kb") == 500_000
+    assert parse_size("1024") == 1024
+
+
+def test_stream_export_shards_casts_and_indexes(tmp_path):
+    """Output is sharded, cast, indexed and checksummed."""
+    src, dst = tmp_path / "sft", tmp_path / "export"
+    _make_checkpoint(src)
+
+    stats = stream_export(str(src), str(dst), dtype="float16", max_shard_size="1KB")
+
+    index = json.loads((dst / "model.safetensors.index.json").read_text())
+    assert stats == {"written": 4, "skipped": 0}
+    assert set(index["weight_map"]) == {f"layer{i}.weight" for i in range(4)} | {"step"}
+    shard = load_file(str(dst / index["weight_map"]["layer0.weight"]))
+    assert shard["layer0.weight"].dtype == torch.float16
+    assert load_file(str(dst / index["weight_map"]["step"]))["step"].dtype == torch.int64
+    assert json.loads((dst / "config.json").read_text())["torch_dtype"] == "float16"
+    assert (dst / "tokenizer.json").exists() and not (dst / "optimizer.pt").exists()
+    assert len(json.loads((dst / MANIFEST_NAME).read_text())["shards"]) == 4
+
+
+def test_stream_export_skips_unchanged_and_repairs_corrupt_shards(tmp_path):
+    """Re-running skips verified shards and rewrites ones whose checksum no longer matches."""
+    src, dst = tmp_path / "sft", tmp_path / "export"
+    _make_checkpoint(src)
+    stream_export(str(src), str(dst), max_shard_size="1KB")
+
+    assert stream_export(str(src), str(dst), max_shard_size="1KB") == {"written": 0, "skipped": 5}
+
+    (dst / "model-00002-of-00005.safetensors").write_bytes(b"corrupt")
+    assert stream_export(str(src), str(dst), max_shard_size="1KB") == {"written": 1, "skipped": 4}
+
+    # A different dtype changes every shard's inputs
+    assert stream_export(str(src), str(dst), dtype="bfloat16", max_shard_size="1KB")["written"] == 4
+
+
+def test_stream_export_rejects_unknown_dtype_before_writing(tmp_path, monkeypatch):
+    import src.quant.export_hf as export_hf
+
+    ckpt = tmp_path / "ckpt"
+    _make_checkpoint(ckpt)
+    monkeypatch.delitem(export_hf._ST_SIZES, "I64")
+    with pytest.raises(ValueError, match="'step'.*I64"):
+        stream_export(str(ckpt), str(tmp_path / "out"), max_shard_size="1KB")
+    assert not (tmp_path / "out").exists()
+
+
+def test_stream_export_keeps_fp8_tensors(tmp_path):
+    ckpt = tmp_path / "ckpt"
+    ckpt.mkdir()
+    weights = {"a.weight": torch.randn(4, 4), "a.scale": torch.randn(4, 4).to(torch.float8_e4m3fn)}
+    save_file(weights, str(ckpt / "model.safetensors"))
+    stream_export(str(ckpt), str(tmp_path / "out"), dtype="float16")
+    out = load_file(str(tmp_path / "out" / "model.safetensors"))
+    assert out["a.weight"].dtype == torch.float16 and out["a.scale"].dtype == torch.float8_e4m3fn
@@ -0,0 +1,128 @@
+"""Tests for the deadline-driven generation controller."""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.agent.generation import GenerationController, StopOnStrings, trim_to_sentence
+from src.utils.config import get_model_config
+
+
+class CharTokenizer:
+    """One character per token id (id = ord); ``<|user|>`` is special token 1."""
+    eos_token_id = 0
+
+    def get_added_vocab(self):
+        return {"<eos>": 0, "<|user|>": 1}
+
+    def decode(self, ids, skip_special_tokens=False):
+        names = {v: k for k, v in self.get_added_vocab().items()}
+        if skip_special_tokens:
+            return "".join(chr(i) for i in ids if i not in names)
+        return "".join(names.get(i) or chr(i) for i in ids)
+
+    def batch_decode(self, ids, skip_special_tokens=False):
+        return [self.decode(row.tolist(), skip_special_tokens) for row in ids]
+
+
+def _ids(*texts):
+    return torch.tensor([[ord(c) for c in t] for t in texts])
+
+
+def test_trim_to_sentence():
+    assert trim_to_sentence("That sounds hard. Have you tried to") == "That sounds hard."
+    assert trim_to_sentence('She said "rest." Then we') == 'She said "rest."'
+    assert trim_to_sentence("Try 2.5 hours of") == "Try 2.5 hours of"
+    assert trim_to_sentence("Done!") == "Done!"
+
+
+def test_from_config_uses_model_section():
+    cfg = get_model_config()
+    controller = GenerationController.from_config(cfg)
+    assert controller.max_new_tokens == cfg["max_new_tokens"]
+    assert controller.temperature == cfg["temperature"]
+    assert controller.top_p == cfg["top_p"]
+    assert controller.stop_strings == cfg["stop_strings"]
+
+
+def test_max_new_tokens_shrinks_with_queue_depth():
+    controller = GenerationController(max_new_tokens=300, min_new_tokens=48, queue_soft_limit=1)
+    assert [controller.max_new_tokens_for(d) for d in (0, 1, 2, 3, 10)] == [300, 300, 150, 100, 48]
+
+
+def test_in_flight_requests_count_as_queue():
+    controller = GenerationController(max_new_tokens=300, queue_soft_limit=0, min_new_tokens=10)
+    with controller.request() as first:
+        with controller.request() as second:
+            assert controller.in_flight == 2
+    assert (first.queue_depth, second.queue_depth) == (0, 1)
+    assert second.max_new_tokens == 300 and controller.in_flight == 0
+    with controller.request(queue_depth=5) as explicit:
+        assert explicit.max_new_tokens == 60
+
+
+def test_time_budget_is_net_of_waiting():
+    controller = GenerationController(max_time_s=10, min_time_s=0.5, temperature=0.7)
+    with controller.request() as budget:
+        kwargs = budget.generate_kwargs(CharTokenizer(), prompt_length=3)
+        assert 9 < kwargs["max_time"] <= 10 and kwargs["do_sample"]
+        budget.started -= 30  # spent the whole budget waiting for an adapter switch
+        assert budget.generate_kwargs(CharTokenizer(), 3)["max_time"] == 0.5
+    with GenerationController().request() as unlimited:
+        assert "max_time" not in unlimited.generate_kwargs(CharTokenizer(), 3)
+
+
+def test_stop_strings_ignore_prompt():
+    stop = StopOnStrings(CharTokenizer(), ["<|user|>"], prompt_length=8)
+    assert stop(_ids("<|user|>hi there...", "<|user|>hi <|user|>"), None).tolist() == [False, True]
+
+
+def _chars(text, *tail):
+    return [ord(c) for c in text] + list(tail)
+
+
+def test_time_budget_starts_once_model_is_ready():
+    controller = GenerationController(max_time_s=10, min_time_s=0.5)
+    with controller.request() as budget:
+        budget.started -= 30  # a cold checkpoint load
+        budget.start()
+        assert 9 < budget.generate_kwargs(CharTokenizer(), 3)["max_time"] <= 10
+
+
+def test_finish():
+    controller = GenerationController(stop_strings=["<|user|>"])
+    tok = CharTokenizer()
+    with controller.request() as budget:
+        assert budget.finish(tok, _chars("Breathe slowly. <|user|> ok")) == "Breathe slowly."
+        assert budget.finish(tok, _chars("Breathe slowly. Then", 0)) == "Breathe slowly. Then"
+        assert budget.finish(tok, _chars("Breathe slowly. Then")) == "Breathe slowly."
+
+
+def test_finish_stops_on_special_token():
+    controller = GenerationController(stop_strings=["<|user|>"])
+    with controller.request() as budget:
+        ids = _chars("Breathe slowly. Then", 1) + _chars(" I feel")
+        assert budget.finish(CharTokenizer(), ids) == "Breathe slowly. Then"
+
+
+def test_generate_respects_time_budget():
+    from transformers import GPT2Config, GPT2LMHeadModel
+
+    config = GPT2Config(vocab_size=64, n_embd=16, n_layer=1, n_head=2, n_positions=4096)
+    model = GPT2LMHeadModel(config).eval()
+    controller = GenerationController(max_new_tokens=4000, max_time_s=0.2, min_time_s=0.0,
+                                      stop_strings=[])
+    with controller.request() as budget:
+        start = time.monotonic()
+        kwargs = budget.generate_kwargs(CharTokenizer(), 3)
+        out = model.generate(input_ids=torch.tensor([[1, 2, 3]]), **kwargs)
+    assert time.monotonic() - start < 2.0
+    assert out.shape[1] < 3 + 4000
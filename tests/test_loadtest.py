@@ -0,0 +1,95 @@
+"""Tests for the synthetic workload generator and load-test harness."""
+
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data.sensor_encoder import RANGES, bucket
+from src.eval.loadtest import (load_workload, main, run_load_test, save_workload, summarize,
+                               synth_workload)
+
+
+def test_workload_is_reproducible_and_varied():
+    a, b = synth_workload(200, 4, seed=7), synth_workload(200, 4, seed=7)
+    assert [(s.window, s.messages) for s in a] == [(s.window, s.messages) for s in b]
+    assert {len(s.messages) for s in a} == {1, 2, 3, 4}
+    for name in RANGES:
+        assert {bucket(name, getattr(s.window, name)) for s in a} == {"low", "mid", "high"}
+    missing_ema = sum(s.window.ema_mood_avg is None for s in a) / len(a)
+    assert 0.15 < missing_ema < 0.45
+    assert any(s.window.resting_hr is None for s in a) and any(s.window.resting_hr for s in a)
+
+
+def test_missing_probabilities():
+    assert all(s.window.ema_mood_avg is None for s in synth_workload(20, 1, missing_ema=1.0))
+    assert all(s.window.resting_hr is not None for s in synth_workload(20, 1, missing_hr=0.0))
+
+
+def test_workload_round_trip(tmp_path):
+    workload = synth_workload(5, 3)
+    save_workload(workload, tmp_path / "w.jsonl")
+    assert load_workload(tmp_path / "w.jsonl") == workload
+
+
+def test_replay_respects_concurrency_and_turn_order():
+    in_flight, peak, lock = 0, 0, threading.Lock()
+    seen = {}
+
+    def send(session, message, history):
+        nonlocal in_flight, peak
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+        seen.setdefault(session.user_id, []).append(len(history))
+        time.sleep(0.02)
+        with lock:
+            in_flight -= 1
+        if message.startswith("Why"):
+            raise RuntimeError("boom")
+        return "ok.", time.perf_counter(), 3
+
+    workload = synth_workload(12, 3, seed=1)
+    results = run_load_test(workload, send, concurrency=3, arrival_rate=200)
+    assert len(results) == sum(len(s.messages) for s in workload)
+    assert peak <= 3
+    assert all(h == list(range(0, 2 * len(h), 2)) for h in seen.values())
+
+    report = summarize(results, wall_seconds=1.0, peak_rss=1, target="fake", settings={})
+    assert report.errors == sum(m.startswith("Why") for s in workload for m in s.messages)
+    latency = report.latency
+    assert latency["p50"] <= latency["p95"] <= latency["p99"] <= latency["max"]
+    assert report.ttft["p99"] <= report.latency["max"]
+
+
+def test_cli_against_tiny_model(tmp_path):
+    pytest.importorskip("torch")
+    report_path = tmp_path / "report.json"
+    code = main(["--tiny-model", str(tmp_path / "tiny"), "--sessions", "2", "--turns", "2",
+                 "--concurrency", "2", "--no-memory", "--report", str(report_path)])
+    report = json.loads(report_path.read_text())
+    assert code == 0 and report["errors"] == 0
+    assert report["requests"] >= 2 and report["requests_per_sec"] > 0
+    assert report["ttft"]["p50"] <= report["latency"]["p50"]
+    assert report["peak_rss_bytes"] > 0
+
+
+def test_cli_memory_stays_out_of_configured_store(tmp_path):
+    pytest.importorskip("torch")
+    from src.utils.config import get_config
+
+    store = Path(get_config().memory.persist_dir)
+    before = set(store.glob("*")) if store.exists() else set()
+    code = main(["--tiny-model", str(tmp_path / "tiny"), "--sessions", "2", "--turns", "2",
+                 "--concurrency", "2"])
+    assert code == 0
+    assert (set(store.glob("*")) if store.exists() else set()) == before
+    assert "MEMORY_DIR" not in os.environ
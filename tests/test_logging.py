@@ -0,0 +1,91 @@
+"""Tests for logging setup."""
+
+import json
+import logging
+import sys
+import threading
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.utils.logging_setup import (
+    JsonFormatter,
+    RateLimitFilter,
+    get_logger,
+    setup_logging,
+    shutdown_logging,
+)
+
+
+def test_async_logging_writes_on_listener_thread(tmp_path):
+    """Async mode renders the message at call time, writes later, flushes on shutdown."""
+    log_file = tmp_path / "agent.log"
+    try:
+        setup_logging(level="INFO", log_file=str(log_file), async_mode=True, json_format=True)
+        values = [1]
+        get_logger("test").info("values=%s", values, extra={"request_id": "r1"})
+        values.append(2)  # mutated before the listener gets to the record
+        shutdown_logging()
+
+        record = json.loads(log_file.read_text().strip().splitlines()[-1])
+        assert record["msg"] == "values=[1]"
+        assert record["request_id"] == "r1"
+        assert record["logger"] == "edge_mental_health_agent.test"
+        assert record["thread"] == threading.current_thread().name
+    finally:
+        shutdown_logging()
+        logging.basicConfig(force=True)
+
+
+def test_shutdown_with_full_queue_detaches_handler(tmp_path):
+    """Shutdown neither raises on a saturated queue nor leaves the queue handler attached."""
+    log_file = tmp_path / "agent.log"
+    release = threading.Event()
+    try:
+        setup_logging(level="INFO", log_file=str(log_file), async_mode=True)
+        handler = logging.getLogger().handlers[0]
+        handler.queue.maxsize = 3
+        stall = logging.makeLogRecord({"msg": "stall", "levelno": logging.INFO,
+                                       "levelname": "INFO"})
+        stall.getMessage = lambda: release.wait(10) and "stall"  # block the writer thread
+        handler.queue.put(stall)
+        for i in range(10):
+            get_logger("test").info("record %d", i)
+        threading.Timer(0.2, release.set).start()
+        shutdown_logging()
+
+        assert handler not in logging.getLogger().handlers
+        get_logger("test").warning("after shutdown")
+        assert handler.queue.empty()
+        assert "record 0" in log_file.read_text()
+    finally:
+        release.set()
+        shutdown_logging()
+        logging.basicConfig(force=True)
+
+
+def test_rate_limit_filter_is_per_logger():
+    """Each logger gets its own bucket and warnings always pass."""
+    rate_filter = RateLimitFilter(rate=0.001, burst=2)
+
+    def record(name, level=logging.INFO):
+        return logging.makeLogRecord({"name": name, "levelno": level})
+
+    assert [rate_filter.filter(record("a")) for _ in range(3)] == [True, True, False]
+    assert rate_filter.filter(record("b"))
+    assert rate_filter.filter(record("a", logging.WARNING))
+    assert rate_filter.dropped == 1
+
+
+def test_json_formatter_includes_exception():
+    """Exceptions are rendered into the JSON payload."""
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        rec = logging.makeLogRecord({"msg": "failed", "levelname": "ERROR",
+                                     "exc_info": sys.exc_info()})
+    payload = json.loads(JsonFormatter().format(rec))
+    assert payload["msg"] == "failed"
+    assert "ValueError: boom" in payload["exc"]
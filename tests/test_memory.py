@@ -0,0 +1,162 @@
+"""Tests for per-user long-term memory: summarization, vector index, budgets."""
+
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.agent.memory import (HashingEmbedder, MemoryStore, UserMemory, VectorIndex, approx_tokens,
+                              extractive_summary)
+from src.agent.prompts import build_prompt
+from src.utils.config import MemoryConfig
+
+
+def _unit(rows, dim, seed=0):
+    v = np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+    return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+class TestVectorIndex:
+    def test_exact_search_below_threshold(self):
+        index = VectorIndex(dim=8, ivf_threshold=100)
+        data = _unit(20, 8)
+        index.add(data)
+        (best, score), *_ = index.search(data[7], k=3)
+        assert best == 7 and abs(score - 1.0) < 1e-5
+
+    def test_ivf_recall(self):
+        dim = 32
+        index = VectorIndex(dim=dim, ivf_threshold=256, nprobe=4)
+        data = _unit(2000, dim)
+        index.add(data[:1000])
+        index.add(data[1000:])
+        assert index._centroids is not None and len(index) == 2000
+        hits = sum(index.search(data[i], k=1)[0][0] == i for i in range(0, 2000, 50))
+        assert hits == 40  # a vector always lands in its own (probed) list
+
+    def test_empty(self):
+        assert VectorIndex(dim=4).search(np.ones(4), k=3) == []
+
+
+def test_embedder_similarity():
+    embed = HashingEmbedder(dim=256)
+    a, b, c = embed(["I could not sleep last night", "sleep was bad last night",
+                     "my sister visited"])
+    assert a @ b > a @ c
+    assert abs(np.linalg.norm(a) - 1.0) < 1e-5
+
+
+def test_extractive_summary_caps_words():
+    summary = extractive_summary(["First point. More detail here.", "Second point!"], max_words=3)
+    assert summary == "First point. Second …"
+
+
+def _config(**overrides):
+    defaults = {"keep_recent_turns": 2, "summarize_every": 4, "top_k": 2, "token_budget": 1000}
+    return MemoryConfig(**{**defaults, **overrides})
+
+
+class TestUserMemory:
+    def test_summarizes_and_bounds_recent(self):
+        memory = UserMemory(_config())
+        for i in range(6):
+            memory.add_turns(f"turn {i}.")
+        assert memory.recent == ["turn 4.", "turn 5."]
+        summaries = [e.text for e in memory.entries if e.kind == "summary"]
+        assert summaries == ["turn 0. turn 1. turn 2. turn 3."]
+        assert len(memory.index) == 7
+
+    def test_retrieves_relevant_older_turns(self):
+        memory = UserMemory(_config())
+        memory.add_turns("User: my dog Biscuit ran away last spring\n")
+        for i in range(20):
+            memory.add_turns(f"User: work meeting number {i}\n")
+        recent, memories = memory.context("I miss Biscuit the dog")
+        assert recent == memory.recent[-2:]
+        assert any("Biscuit" in m for m in memories)
+        assert not set(recent) & set(memories)
+
+    def test_token_budget_is_respected(self):
+        memory = UserMemory(_config(top_k=10))
+        for i in range(40):
+            memory.add_turns(f"User: sleep was poor on night {i}\n")
+
+        def count(s):
+            return len(s.split())
+
+        for budget in (0, 5, 30, 80):
+            recent, memories = memory.context("sleep", token_budget=budget, count_tokens=count)
+            assert sum(map(count, recent + memories)) <= budget
+
+    def test_long_recent_turn_is_truncated_not_dropped(self):
+        memory = UserMemory(_config(keep_recent_turns=6, top_k=4, token_budget=256))
+        reply = "Assistant: Try box breathing. " + "Inhale for four, hold for four. " * 50 + "\n"
+        memory.add_turns("User: teach me a breathing exercise\n", reply,
+                         "User: What was that exercise again?\n")
+        recent, memories = memory.context("What was that exercise again?")
+        assert len(recent) == 2 and recent[-1] == "User: What was that exercise again?\n"
+        assert recent[0].startswith("Assistant: Try box breathing.") and recent[0].endswith(" …\n")
+        assert sum(map(approx_tokens, recent + memories)) <= 256
+
+
+def test_store_persists_per_user(tmp_path):
+    store = MemoryStore(_config(persist_dir=str(tmp_path)))
+    store.add_turns("alice/1", "User: hello\n", "Assistant: hi\n")
+
+    reloaded = MemoryStore(_config(persist_dir=str(tmp_path))).get("alice/1")
+    assert reloaded.recent == ["User: hello\n", "Assistant: hi\n"]
+    assert len(reloaded.index) == 2
+    assert MemoryStore(_config(persist_dir=str(tmp_path))).get("bob").entries == []
+
+
+def test_store_keeps_dotted_user_ids_apart(tmp_path):
+    store = MemoryStore(_config(persist_dir=str(tmp_path)))
+    store.add_turns("j.smith@x.com", "User: my dog is called Biscuit\n")
+    store.add_turns("j.smith@x.org", "User: I moved to Leeds\n")
+
+    fresh = MemoryStore(_config(persist_dir=str(tmp_path)))
+    assert fresh.get("j.smith@x.com").recent == ["User: my dog is called Biscuit\n"]
+    assert fresh.get("j.smith@x.org").recent == ["User: I moved to Leeds\n"]
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_store_appends_and_replays_incrementally(tmp_path):
+    a = MemoryStore(_config(persist_dir=str(tmp_path)))
+    b = MemoryStore(_config(persist_dir=str(tmp_path)))
+    for i in range(5):
+        a.add_turns("u", f"User: turn {i}.\n")
+    b.add_turns("u", "User: turn 5.\n")  # catches up on a's turns before appending
+    assert a.get("u").entries == b.get("u").entries
+    summaries = [e.text for e in b.get("u").entries if e.kind == "summary"]
+    assert summaries == ["User: turn 0. User: turn 1. User: turn 2. User: turn 3."]
+    assert len(next(tmp_path.iterdir()).read_text().splitlines()) == 6
+
+
+def test_store_writers_sharing_a_user_lose_nothing(tmp_path):
+    """Separate stores stand in for serving workers; each opens its own file handles."""
+    stores = [MemoryStore(_config(persist_dir=str(tmp_path))) for _ in range(3)]
+
+    def chat(i):
+        for j in range(30):
+            stores[i].add_turns("u", f"User: worker {i} turn {j}.\n")
+
+    threads = [threading.Thread(target=chat, args=(i,)) for i in range(len(stores))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    views = [store.get("u").entries for store in stores]
+    assert sum(e.kind == "turn" for e in views[0]) == 90
+    assert views[0] == views[1] == views[2]
+
+
+def test_build_prompt_memory_section():
+    plain = build_prompt("ctx", "hi", [])
+    assert "<|memory|>" not in plain
+    with_memory = build_prompt("ctx", "hi", [], ["slept badly in May"])
+    assert "<|memory|>\n- slept badly in May\n<|user|>" in with_memory
@@ -0,0 +1,124 @@
+"""Tests for the compiled prompt template shared by training and serving."""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.data.prompt_template import CHAT_LAYOUT, PromptTemplate, load_chat_template
+from src.data.sensor_encoder import encode_for_prompt, SensorWindow
+
+
+class CharTokenizer:
+    """One token per character (id = ord), BOS = 1; counts the strings it tokenizes."""
+
+    def __init__(self):
+        self.seen = []
+
+    def __call__(self, text, add_special_tokens=True):
+        texts = [text] if isinstance(text, str) else list(text)
+        self.seen.extend(texts)
+        ids = [([1] if add_special_tokens else []) + [ord(c) for c in t] for t in texts]
+        return {"input_ids": ids[0] if isinstance(text, str) else ids}
+
+
+def _row(**overrides):
+    row = {
+        "sensor_prompt": ("# Contextual Well-being Snapshot (last 14 days)\n"
+                          "sleep_efficiency: low (0.68)\n"),
+        "dialogue": "User: I keep waking up and doomscrolling.",
+        "target_response": "That sounds draining.",
+    }
+    row.update(overrides)
+    return row
+
+
+def test_static_fields_are_compiled_in():
+    template = PromptTemplate("<a>{system}<b>{x}<c>{y}", system="SYS")
+    assert template.fields == ["x", "y"]
+    assert template.literals == ["<a>SYS<b>", "<c>", ""]
+    assert template.render({"x": "1"}) == "<a>SYS<b>1<c>"
+    with pytest.raises(ValueError):
+        PromptTemplate("{x:>4}")
+
+
+def _metaspace_tokenizer():
+    """Tiny SentencePiece-style (Metaspace BPE) tokenizer, like InternLM2's."""
+    tokenizers = pytest.importorskip("tokenizers")
+    from transformers import PreTrainedTokenizerFast
+
+    tk = tokenizers.Tokenizer(tokenizers.models.BPE(unk_token="<unk>"))
+    tk.pre_tokenizer = tokenizers.pre_tokenizers.Metaspace()
+    tk.decoder = tokenizers.decoders.Metaspace()
+    specials = ["<unk>", "<|user|>", "<|assistant|>"]
+    corpus = ["Okay. That sounds draining.\n", "I keep waking up and doomscrolling.\n"]
+    trainer = tokenizers.trainers.BpeTrainer(vocab_size=200, special_tokens=specials)
+    tk.train_from_iterator(corpus, trainer)
+    return PreTrainedTokenizerFast(tokenizer_object=tk, unk_token="<unk>")
+
+
+def test_encode_batch_matches_render():
+    template = PromptTemplate("<a>{system}<b>{x}<c>{y}", system="SYS")
+    tok = CharTokenizer()
+    rows = [{"x": "hi", "y": "there"}, {"x": "hi"}, {}]
+    out = template.encode_batch(rows, tok, return_text=True)
+    assert tok.seen == out["text"] == template.render_batch(rows)  # one batched call
+    for ids, text in zip(out["input_ids"], out["text"]):
+        assert ids == [1] + [ord(c) for c in text]  # BOS once, in front
+    assert out["attention_mask"][0] == [1] * len(out["input_ids"][0])
+    truncated = template.encode_batch(rows, tok, max_length=4)["input_ids"][0]
+    assert truncated == [1, ord("<"), ord("a"), ord(">")]
+
+
+def test_encode_batch_matches_metaspace_tokenization():
+    """Per-segment tokenization would add a word boundary before every segment."""
+    tok = _metaspace_tokenizer()
+    template = PromptTemplate("<|user|>\n{dialogue}\n<|assistant|>\n{target}")
+    row = {"dialogue": "I keep waking up.", "target": "Okay. That sounds draining."}
+    ids = template.encode_batch([row], tok)["input_ids"][0]
+    assert ids == tok(template.render(row))["input_ids"]
+
+
+def test_serving_prompt_matches_layout():
+    from src.agent.prompts import SYSTEM, build_prompt
+
+    history = [f"turn {i}\n" for i in range(8)]
+    expected = CHAT_LAYOUT.format(system=SYSTEM, memory="", context="ctx", dialogue="User: hi",
+                                  history="".join(history[-6:]), target="")
+    assert build_prompt("ctx", "hi", history) == expected
+
+
+def test_training_rows_extend_serving_prompt():
+    """Train/serve parity: the serving prompt is a token-for-token prefix of the SFT row."""
+    pytest.importorskip("datasets")
+    from src.agent.prompts import encode_prompt
+    from src.training.sft import batch_fields, format_example
+
+    tok = CharTokenizer()
+    row = _row()
+    batch = {k: [v, v] for k, v in row.items()}  # columnar, as datasets passes it
+    train = load_chat_template().encode_batch(batch_fields(batch), tok)["input_ids"]
+    serve = encode_prompt(tok, row["sensor_prompt"], "I keep waking up and doomscrolling.", [])
+    assert train[0] == train[1]
+    assert train[0][:len(serve)] == serve
+    assert "".join(map(chr, train[0][len(serve):])) == row["target_response"]
+    assert format_example(row).endswith("<|assistant|>\nThat sounds draining.")
+
+
+def test_raw_sensor_rows_rendered_in_batch():
+    pytest.importorskip("datasets")
+    from src.training.sft import batch_fields
+
+    start = datetime(2024, 1, 1)
+    window = dict(start=start, end=start + timedelta(days=14), sleep_efficiency=0.6,
+                  avg_sleep_duration_h=6.0, steps=1500, vigorous_min=5, screen_time_min=300,
+                  unlocks=90, locations_visited=3, ema_mood_avg=None)
+    rows = [_row(sensor_prompt=None, **window), _row(**{k: None for k in window})]
+    fields = batch_fields({k: [r[k] for r in rows] for k in rows[0]})
+    assert fields[0]["context"] == encode_for_prompt(SensorWindow(**window))
+    assert fields[1]["context"] == rows[1]["sensor_prompt"]
@@ -0,0 +1,102 @@
+"""Tests for the q4f16 quantization emulator."""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+import torch
+from safetensors.torch import load_file, save_file
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.quant import q4f16_emulator
+from src.quant.q4f16_emulator import (
+    MAX_INT,
+    QuantReport,
+    dequantize_q4f16,
+    quantize_checkpoint,
+    quantize_q4f16,
+    quantized_nbytes,
+)
+
+
+def test_roundtrip_error_within_half_step():
+    """Dequantized weights are within half a quantization step of the original."""
+    torch.manual_seed(0)
+    weight = torch.randn(8, 70)  # not a multiple of the group size
+    packed, scale = quantize_q4f16(weight)
+
+    assert packed.dtype == torch.uint8 and packed.shape == (8, 48)
+    assert scale.dtype == torch.float16 and scale.shape == (8, 3)
+
+    deq = dequantize_q4f16(packed, scale, weight.shape[1]).float()
+    step = scale.float().repeat_interleave(32, dim=1)[:, :70]
+    assert torch.all((deq - weight).abs() <= step / 2 + 1e-3)
+
+
+def test_codes_are_symmetric_and_zero_groups_survive():
+    """Group max maps to the extreme code and all-zero groups stay zero."""
+    weight = torch.zeros(1, 64)
+    weight[0, :32] = torch.linspace(-1, 1, 32)
+    packed, scale = quantize_q4f16(weight)
+    codes = torch.stack((packed & 0x0F, packed >> 4), dim=-1).view(1, -1)
+
+    assert codes[0, :32].min() == 0 and codes[0, :32].max() == 2 * MAX_INT
+    assert torch.all(codes[0, 32:] == MAX_INT)
+    assert torch.all(dequantize_q4f16(packed, scale, 64)[0, 32:] == 0)
+
+
+def test_quantize_checkpoint_processes_each_shard(tmp_path):
+    """Every shard is rewritten, side files are copied and sizes are reported."""
+    src, dst = tmp_path / "hf", tmp_path / "q"
+    src.mkdir()
+    shards = {
+        "model-00001-of-00002.safetensors": {"a.weight": torch.randn(16, 64),
+                                             "a.bias": torch.randn(16)},
+        "model-00002-of-00002.safetensors": {"b.weight": torch.randn(4, 32)},
+    }
+    weight_map = {}
+    for name, tensors in shards.items():
+        save_file(tensors, str(src / name))
+        weight_map.update({k: name for k in tensors})
+    (src / "model.safetensors.index.json").write_text(json.dumps({"weight_map": weight_map}))
+    (src / "config.json").write_text("{}")
+
+    report = quantize_checkpoint(str(src), str(dst), workers=2)
+
+    assert (dst / "config.json").exists()
+    second = load_file(str(dst / "model-00002-of-00002.safetensors"))
+    assert second["b.weight"].dtype == torch.float16
+    assert report.quantized_tensors == 2 and report.fp16_tensors == 1
+    assert report.original_bytes == (16 * 64 + 16 + 4 * 32) * 4
+    expected = quantized_nbytes((16, 64)) + quantized_nbytes((4, 32)) + 16 * 2
+    assert report.compressed_bytes == expected
+    assert 0 < report.max_rel_error < 0.2
+
+
+def _gate(monkeypatch, tmp_path, baseline_ppl, emulated_ppl, rows=1):
+    val = tmp_path / "val.jsonl"
+    row = {"sensor_prompt": "ctx", "dialogue": "User: hi", "target_response": "ok"}
+    val.write_text((json.dumps(row) + "\n") * rows)
+    results = iter([{"perplexity": baseline_ppl, "tokens_per_sec": 1.0},
+                    {"perplexity": emulated_ppl, "tokens_per_sec": 1.0}])
+    monkeypatch.setattr(q4f16_emulator, "quantize_checkpoint", lambda *a: QuantReport())
+    monkeypatch.setattr(q4f16_emulator, "evaluate", lambda *a: next(results))
+    return q4f16_emulator.main(["--val", str(val), "--max-ppl-delta", "0.5", "--hf-dir", "hf",
+                                "--out", str(tmp_path / "q")])
+
+
+def test_ppl_gate_fails_on_divergence(monkeypatch, tmp_path):
+    assert _gate(monkeypatch, tmp_path, 10.0, 10.2) == 0
+    assert _gate(monkeypatch, tmp_path, 10.0, 11.0) == 1
+    assert _gate(monkeypatch, tmp_path, 10.0, float("nan")) == 1
+    assert _gate(monkeypatch, tmp_path, 10.0, float("inf")) == 1
+
+
+def test_empty_validation_set_is_a_usage_error(monkeypatch, tmp_path):
+    with pytest.raises(SystemExit) as exc:
+        _gate(monkeypatch, tmp_path, 10.0, 10.0, rows=0)
+    assert exc.value.code == 2
@@ -0,0 +1,165 @@
+"""Tests for the model registry: LRU residency, shared tokenizers, hot swaps."""
+
+import shutil
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("tokenizers")
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.agent.registry import ModelRegistry, checkpoint_nbytes, tokenizer_fingerprint
+
+
+def _tokenizer(words):
+    from tokenizers import Tokenizer, models, pre_tokenizers, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    t = Tokenizer(models.BPE(unk_token="<unk>"))
+    t.pre_tokenizer = pre_tokenizers.ByteLevel()
+    trainer = trainers.BpeTrainer(vocab_size=300, special_tokens=["<unk>", "<eos>"],
+                                  initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+    t.train_from_iterator([words] * 10, trainer)
+    return PreTrainedTokenizerFast(tokenizer_object=t, eos_token="<eos>", unk_token="<unk>")
+
+
+def _checkpoint(path, tok, seed, n_positions=64):
+    from transformers import GPT2Config, GPT2LMHeadModel
+
+    torch.manual_seed(seed)
+    config = GPT2Config(vocab_size=len(tok), n_embd=32, n_layer=1, n_head=2,
+                        n_positions=n_positions)
+    GPT2LMHeadModel(config).save_pretrained(path)
+    tok.save_pretrained(path)
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def checkpoints(tmp_path_factory):
+    root = tmp_path_factory.mktemp("ckpts")
+    tok = _tokenizer("hello world sleep user assistant")
+    a = _checkpoint(root / "a", tok, seed=1)
+    b = _checkpoint(root / "b", tok, seed=2)
+    c = _checkpoint(root / "c", _tokenizer("entirely different corpus of words"), seed=3)
+    return a, b, c
+
+
+def _first_weight(handle):
+    return next(handle.model.parameters()).detach().clone()
+
+
+def test_shared_tokenizers(checkpoints):
+    a, b, c = checkpoints
+    assert tokenizer_fingerprint(a) == tokenizer_fingerprint(b) != tokenizer_fingerprint(c)
+    registry = ModelRegistry(warmup_prompt=None)
+    for name, path in zip("abc", checkpoints):
+        registry.register(name, path)
+    assert registry.get("a").tokenizer is registry.get("b").tokenizer
+    assert registry.get("a").tokenizer is not registry.get("c").tokenizer
+
+
+def test_lru_eviction_under_budget(checkpoints):
+    a, b, c = checkpoints
+    size = checkpoint_nbytes(a)
+    registry = ModelRegistry(memory_budget_bytes=int(size * 2.5), warmup_prompt="hello")
+    for name, path in zip("abc", checkpoints):
+        registry.register(name, path)
+
+    held = registry.get("a")
+    registry.get("b")
+    registry.get("a")  # refresh a; b is now least recently used
+    registry.get("c")
+    assert registry.resident == ["a", "c"]
+
+    # An evicted handle still serves the request holding it
+    registry.get("b")
+    assert "a" not in registry.resident
+    ids = held.tokenizer("hello", return_tensors="pt")
+    out = held.model.generate(**ids, max_new_tokens=2, pad_token_id=held.tokenizer.eos_token_id)
+    assert out.shape[1] > 1
+
+
+def test_deploy_swaps_after_load(checkpoints):
+    a, b, _ = checkpoints
+    registry = ModelRegistry()
+    registry.register("default", a)
+    old = registry.get("default")
+
+    new = registry.deploy("default", b).result(timeout=60)
+    assert registry.get("default") is new
+    assert registry.paths["default"] == b
+    assert not torch.equal(_first_weight(old), _first_weight(new))
+    assert new.tokenizer is old.tokenizer
+
+
+def test_failed_deploy_keeps_serving(checkpoints, tmp_path):
+    a, _, _ = checkpoints
+    registry = ModelRegistry(warmup_prompt=None)
+    registry.register("default", a)
+    old = registry.get("default")
+
+    broken = tmp_path / "broken"
+    shutil.copytree(a, broken)
+    for weights in broken.glob("*.safetensors"):
+        weights.write_bytes(b"not safetensors")
+    assert registry.deploy("default", str(broken)).exception(timeout=60) is not None
+    assert registry.get("default") is old
+    assert registry.paths["default"] == a
+
+
+def test_failed_deploy_evicts_nothing(checkpoints, tmp_path):
+    a, b, _ = checkpoints
+    registry = ModelRegistry(memory_budget_bytes=int(checkpoint_nbytes(a) * 2.5),
+                             warmup_prompt=None)
+    registry.register("a", a)
+    registry.register("b", b)
+    registry.get("a")
+    registry.get("b")
+    broken = tmp_path / "broken"
+    shutil.copytree(a, broken)
+    for weights in broken.glob("*.safetensors"):
+        weights.write_bytes(b"\0" * weights.stat().st_size)  # right size, unreadable
+    assert registry.deploy("c", str(broken)).exception(timeout=60) is not None
+    assert registry.resident == ["a", "b"]
+
+
+def test_cold_load_does_not_revert_deploy(checkpoints, monkeypatch):
+    a, b, _ = checkpoints
+    registry = ModelRegistry(warmup_prompt=None)
+    registry.register("default", a)
+    load = registry._load
+    loading, release = threading.Event(), threading.Event()
+
+    def slow_load(name, path):
+        if path == a:  # the request's cold load of the old checkpoint
+            loading.set()
+            release.wait(10)
+        return load(name, path)
+
+    monkeypatch.setattr(registry, "_load", slow_load)
+    cold = ThreadPoolExecutor(1).submit(registry.get, "default")
+    assert loading.wait(10)
+    new = registry.deploy("default", b).result(timeout=60)
+    release.set()
+    assert cold.result(timeout=60) is new
+    assert registry.get("default") is new and registry.paths["default"] == b
+
+
+def test_unknown_model():
+    with pytest.raises(KeyError):
+        ModelRegistry().get("missing")
+
+
+def test_runtime_default_comes_from_config(monkeypatch, tmp_path):
+    from src.agent import runtime
+
+    monkeypatch.setenv("SFT_CKPT", str(tmp_path / "sft"))
+    monkeypatch.setattr(runtime, "_registry", None)
+    assert runtime.get_registry().paths[runtime.DEFAULT_MODEL] == str(tmp_path / "sft")
@@ -9,7 +9,7 @@ from datetime import datetime, timedelta
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.data.sensor_encoder import SensorWindow, encode_for_prompt, bucket
+from src.data.sensor_encoder import SensorWindow, encode_batch, encode_for_prompt, bucket
 
 
 class TestSensorEncoder:
@@ -147,6 +147,29 @@ class TestSensorEncoder:
         encoded = encode_for_prompt(window)
         assert "14 days" in encoded
 
+    def test_encode_batch_matches_single(self):
+        """Test batch rendering matches per-window encoding, bucket edges included."""
+        start = datetime(2024, 1, 1)
+        windows = [
+            SensorWindow(
+                start=start,
+                end=start + timedelta(days=days),
+                sleep_efficiency=se,
+                avg_sleep_duration_h=5.5,  # lower edge is mid
+                steps=steps,
+                vigorous_min=10,
+                screen_time_min=240,  # upper edge is mid
+                unlocks=121,
+                locations_visited=4,
+                ema_mood_avg=ema
+            )
+            for days, se, steps, ema in [(14, 0.69, 10001, 1.5), (7, 0.9, 1999, None),
+                                         (1, 0.7, 2000, 0.0)]
+        ]
+        assert encode_batch(windows) == [encode_for_prompt(w) for w in windows]
+        assert "sleep_efficiency: mid (0.90)" in encode_batch(windows)[1]
+        assert encode_batch([]) == []
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -0,0 +1,108 @@
+"""Tests for config-driven training arguments and throughput telemetry."""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.training.telemetry import SUMMARY_NAME, ThroughputCallback
+from src.training.training_args import build_training_arguments
+from src.utils.config import get_training_config
+
+
+def test_training_arguments_from_config(tmp_path):
+    """Config sections map onto TrainingArguments, including renamed keys."""
+    section = dict(get_training_config()["sft"])
+    section.update(bf16=False, optim="adamw_torch", dataloader_num_workers=0,
+                   dataloader_persistent_workers=False, gradient_checkpointing=True)
+    args = build_training_arguments(section, output_dir=str(tmp_path), use_cpu=True)
+
+    assert args.output_dir == str(tmp_path)
+    assert args.gradient_accumulation_steps == 16
+    assert args.gradient_checkpointing
+    assert args.eval_strategy == "steps"
+    assert not hasattr(args, "max_length")
+
+
+def test_throughput_callback_writes_summary(tmp_path):
+    """A short CPU run produces a run summary with a time breakdown."""
+    torch = pytest.importorskip("torch")
+    from datasets import Dataset
+    from transformers import GPT2Config, GPT2LMHeadModel, Trainer
+
+    torch.manual_seed(0)
+    model = GPT2LMHeadModel(GPT2Config(vocab_size=64, n_embd=16, n_layer=1, n_head=2,
+                                       n_positions=32))
+    ids = [[i % 64 for i in range(j, j + 16)] for j in range(8)]
+    ds = Dataset.from_dict({"input_ids": ids, "labels": ids})
+    args = build_training_arguments(
+        {"per_device_train_batch_size": 2, "gradient_accumulation_steps": 2, "max_steps": 2,
+         "logging_steps": 1, "include_num_input_tokens_seen": True, "report_to": "none"},
+        output_dir=str(tmp_path), use_cpu=True,
+    )
+    callback = ThroughputCallback()
+    Trainer(model=model, args=args, train_dataset=ds, callbacks=[callback]).train()
+
+    summary = json.loads((tmp_path / SUMMARY_NAME).read_text())
+    assert summary["global_step"] == 2 and summary["steps_timed"] == 2
+    assert summary["tokens_per_sec"] > 0 and summary["samples_per_sec"] > 0
+    assert summary["seconds"]["compute"] > 0
+    assert summary["bound"] in {"input", "compute"}
+    assert summary["peak_memory_bytes"]["host_rss"] > 0
+
+
+def _tiny_run(output_dir, max_steps, **overrides):
+    from datasets import Dataset
+    from transformers import GPT2Config, GPT2LMHeadModel
+
+    from src.training.checkpointing import AsyncCheckpointTrainer
+
+    model = GPT2LMHeadModel(GPT2Config(vocab_size=64, n_embd=16, n_layer=1, n_head=2,
+                                       n_positions=32))
+    ids = [[i % 64 for i in range(j, j + 16)] for j in range(16)]
+    ds = Dataset.from_dict({"input_ids": ids, "labels": ids})
+    args = build_training_arguments(
+        {"per_device_train_batch_size": 2, "max_steps": max_steps, "save_steps": 2,
+         "save_total_limit": 2, "logging_steps": 1, "report_to": "none", **overrides},
+        output_dir=str(output_dir), use_cpu=True,
+    )
+    return AsyncCheckpointTrainer(model=model, args=args, train_dataset=ds)
+
+
+def test_async_checkpoints_are_atomic_rotated_and_resumable(tmp_path):
+    """Checkpoints are published with manifests, rotated, and resumed past corruption."""
+    pytest.importorskip("torch")
+    from src.training.checkpointing import MANIFEST_NAME, find_latest_checkpoint, verify_checkpoint
+
+    _tiny_run(tmp_path, max_steps=6).train()
+
+    names = sorted(p.name for p in tmp_path.iterdir()
+                   if p.name.startswith(("checkpoint-", ".tmp-")))
+    assert names == ["checkpoint-4", "checkpoint-6"]
+    assert all(verify_checkpoint(str(tmp_path / n), checksums=True) for n in names)
+    assert (tmp_path / "checkpoint-6" / MANIFEST_NAME).exists()
+
+    # A truncated optimizer file invalidates the newest checkpoint
+    optimizer = tmp_path / "checkpoint-6" / "optimizer.pt"
+    optimizer.write_bytes(optimizer.read_bytes()[:10])
+    latest = find_latest_checkpoint(str(tmp_path))
+    assert latest == str(tmp_path / "checkpoint-4")
+
+    from transformers import TrainerCallback
+
+    steps = []
+
+    class RecordSteps(TrainerCallback):
+        def on_step_end(self, args, state, control, **kwargs):
+            steps.append(state.global_step)
+
+    trainer = _tiny_run(tmp_path, max_steps=8)
+    trainer.add_callback(RecordSteps())
+    trainer.train(resume_from_checkpoint=latest)
+    assert steps == [5, 6, 7, 8]
+    assert find_latest_checkpoint(str(tmp_path)) == str(tmp_path / "checkpoint-8")
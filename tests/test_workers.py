@@ -0,0 +1,96 @@
+"""Tests for multi-process serving with shared memory-mapped weights."""
+
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("accelerate")
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.agent.registry import load_mmap_model
+from src.agent.workers import WorkerPool, core_groups
+from src.data.sensor_encoder import SensorWindow
+from src.quant.shards import mmap_state_dict
+from tests.test_registry import _checkpoint, _tokenizer
+
+
+@pytest.fixture(scope="module")
+def checkpoint(tmp_path_factory):
+    return _checkpoint(tmp_path_factory.mktemp("ckpt") / "model",
+                       _tokenizer("hello world sleep user assistant"), seed=0, n_positions=2048)
+
+
+def test_core_groups_partition_available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+    else:
+        available = list(range(os.cpu_count()))
+    groups = core_groups(cores_per_worker=1)
+    assert sorted(c for g in groups for c in g) == available
+    assert len(core_groups(num_workers=10_000)) == len(available)
+    assert len(core_groups(num_workers=1)) == 1
+
+
+def test_mmap_state_dict_matches_and_is_file_backed(checkpoint):
+    from transformers import AutoModelForCausalLM
+
+    state = mmap_state_dict(checkpoint)
+    reference = AutoModelForCausalLM.from_pretrained(checkpoint).state_dict()
+    for name, tensor in state.items():
+        assert torch.equal(tensor, reference[name])
+
+    model = load_mmap_model(checkpoint)
+    ids = torch.tensor([[1, 2, 3]])
+    reference = AutoModelForCausalLM.from_pretrained(checkpoint)
+    assert torch.allclose(model(ids).logits, reference(ids).logits)
+    # The weights live in the mapped shard file, not in a private copy
+    maps = Path("/proc/self/maps")
+    if maps.exists():
+        address = model.transformer.h[0].mlp.c_fc.weight.data_ptr()
+        backing = []
+        for line in maps.read_text().splitlines():
+            start, end = (int(x, 16) for x in line.split()[0].split("-"))
+            if start <= address < end:
+                backing.append(line.split()[-1])
+        assert backing and backing[0].endswith(".safetensors")
+
+
+def _window():
+    return SensorWindow(start=datetime(2024, 1, 1), end=datetime(2024, 1, 14), sleep_efficiency=0.8,
+                        avg_sleep_duration_h=7, steps=5000, vigorous_min=10, screen_time_min=200,
+                        unlocks=50, locations_visited=3)
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="core pinning needs Linux")
+def test_pool_serves_and_recovers(checkpoint, monkeypatch, tmp_path):
+    monkeypatch.setenv("SFT_CKPT", checkpoint)
+    monkeypatch.setenv("LOG_FILE", str(tmp_path / "agent.log"))  # workers set up logging
+    with WorkerPool(num_workers=2, request_timeout=60, health_interval=3600) as pool:
+        futures = [pool.submit(_window(), f"hello {i}", []) for i in range(4)]
+        assert all(isinstance(f.result(timeout=60), str) for f in futures)
+        stats = pool.stats()
+        assert len(stats) == min(2, len(os.sched_getaffinity(0)))
+        assert sum(s["served"] for s in stats) == 4
+        assert len({tuple(s["cores"]) for s in stats}) == len(stats)
+
+        with pytest.raises(ValueError):
+            pool.step(_window(), "   ", [])
+
+        os.kill(stats[0]["pid"], signal.SIGKILL)
+        time.sleep(0.5)
+        pool.check_health()
+        deadline = time.time() + 60
+        while pool.stats()[0]["restarts"] < 1 or not pool.stats()[0]["alive"]:
+            assert time.time() < deadline
+            time.sleep(0.2)
+        assert pool.stats()[0]["pid"] != stats[0]["pid"]
+        assert isinstance(pool.step(_window(), "still there?", []), str)